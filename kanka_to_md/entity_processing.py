@@ -11,7 +11,11 @@ Provides helpers to:
 Intended for use in the Kanka to Markdown/HTML workflow.
 """
 
-from typing import List, Dict, Any, Set
+from types import MappingProxyType
+from typing import AbstractSet, List, Dict, Any, Set, Tuple
+
+# Read-only stand-in for entries without an 'entity' key
+_NO_ENTITY = MappingProxyType({})
 
 
 def build_entity_map(entries: List[Dict[str, Any]]) -> Dict[int, Dict[str, str]]:
@@ -27,6 +31,41 @@ def build_entity_map(entries: List[Dict[str, Any]]) -> Dict[int, Dict[str, str]]
     return entity_map
 
 
+def build_indexes(
+    entries: List[Dict[str, Any]],
+    char_type_ids: AbstractSet[int] = frozenset({1}),
+) -> Tuple[Dict[int, Dict[str, str]], Dict[int, List[Dict[str, Any]]], Dict[int, int]]:
+    """
+    Build the entity map, the entries grouped by type_id, and the character id to
+    entity id mapping in a single pass over the entries.
+
+    The results match build_entity_map, filter_entities_by_type and
+    build_character_id_to_entity_id respectively.
+    """
+    entity_map = {}
+    by_type_id = {}
+    char_id_to_entity_id = {}
+    for entry in entries:
+        entity = entry.get('entity')
+        if not entity:
+            continue
+        eid = entity['id']
+        get = entity.get
+        entity_map[eid] = {
+            'name': entry.get('name') or get('name', 'Unknown'),
+            'type': get('type', 'Unknown'),
+        }
+        tid = get('type_id')
+        bucket = by_type_id.get(tid)
+        if bucket is None:
+            by_type_id[tid] = [entry]
+        else:
+            bucket.append(entry)
+        if tid in char_type_ids:
+            char_id_to_entity_id[entry['id']] = eid
+    return entity_map, by_type_id, char_id_to_entity_id
+
+
 def get_type_id_sets() -> Dict[str, set]:
     """Return a dictionary of type_id sets for each entity type."""
     return {
@@ -49,12 +88,15 @@ def get_type_id_sets() -> Dict[str, set]:
 
 def filter_entities_by_type(entries: List[Dict[str, Any]], type_ids: Set[int]) -> List[Dict[str, Any]]:
     """Filter entities by a set of type_ids."""
-    return [e for e in entries if e.get('entity', {}).get('type_id') in type_ids]
+    return [e for e in entries if e.get('entity', _NO_ENTITY).get('type_id') in type_ids]
 
 
 def filter_entities_by_type_dict(entries: List[Dict[str, Any]], type_ids: Set[int]) -> Dict[int, Dict[str, Any]]:
     """Filter entities by a set of type_ids and return as a dict keyed by entity id."""
-    return {e['entity']['id']: e for e in entries if e.get('entity', {}).get('type_id') in type_ids}
+    return {
+        e['entity']['id']: e for e in entries
+        if e.get('entity', _NO_ENTITY).get('type_id') in type_ids
+    }
 
 
 def build_character_id_to_entity_id(entries: List[Dict[str, Any]]) -> Dict[int, int]:
@@ -35,11 +35,21 @@ if not logging.getLogger().hasHandlers():
     )
 logger = logging.getLogger(__name__)
 
+# Matches Markdown headings deeper than h6 (7 or 8 '#'), which Python-Markdown
+# does not support; they are rewritten to [[[H7]]]/[[[H8]]] placeholders.
+_DEEP_HEADING_RE = re.compile(r'^(#{7,8})\s*(.*)', re.MULTILINE)
+
+# Per-heading-line patterns, compiled once since they run for every heading
+# of the document: the trailing ((+++slug)) reference, the whole heading
+# with its level/title/slug parts, and leftover leading '#' markers.
+_HEADING_SLUG_RE = re.compile(r'\s*\(\(\++[^)]+\)\)\s*$')
+_HEADING_DEEP_SLUG_RE = re.compile(r'\s*\(\(\+{5,}[^)]+\)\)\s*$')
+_HEADING_PARTS_RE = re.compile(r'^(#+)\s*(.*?)\s*\(\((\++)([^)]+)\)\)')
+_LEADING_HASHES_RE = re.compile(r'^#+\s*')
+
 
 def embed_images_as_base64(html_content):
     """Convert image references to embedded base64 data."""
-    import os
-    
     # Find all img tags with gallery references
     soup = BeautifulSoup(html_content, 'html.parser')
     img_tags = soup.find_all('img')
@@ -81,16 +91,20 @@ def embed_images_as_base64(html_content):
     return str(soup)
 
 
+def clean_heading_line(line):
+    """Remove a trailing slug reference like ((++++++city)) from a single heading line."""
+    cleaned_line = _HEADING_SLUG_RE.sub('', line)
+    cleaned_line = _HEADING_DEEP_SLUG_RE.sub('', cleaned_line)
+    return cleaned_line.rstrip()
+
+
 def clean_markdown_content(md):
     """Remove slug references like ((++++++city)) from headings while preserving the heading text."""
     lines = md.split('\n')
     cleaned_lines = []
     for line in lines:
         if line.strip().startswith('#'):
-            cleaned_line = re.sub(r'\s*\(\(\++[^)]+\)\)\s*$', '', line)
-            cleaned_line = re.sub(r'\s*\(\(\+{5,}[^)]+\)\)\s*$', '', cleaned_line)
-            cleaned_line = cleaned_line.rstrip()
-            cleaned_lines.append(cleaned_line)
+            cleaned_lines.append(clean_heading_line(line))
         else:
             cleaned_lines.append(line)
     return '\n'.join(cleaned_lines)
@@ -125,13 +139,15 @@ def detect_hierarchy_level(text):
 def convert_markdown_to_html(markdown_content):
     """Convert Markdown to HTML using the markdown package, then post-process links for custom classes and add ids to headings. Also handle h7/h8 as custom divs and hierarchy levels."""
     
-    # Parse hierarchy levels from original markdown BEFORE cleaning
+    # Parse hierarchy levels from the original headings and clean them in the same pass,
+    # so the document is only split into lines once
     hierarchy_levels = {}
-    lines = markdown_content.split('\n')
-    for line in lines:
+    cleaned_lines = []
+    has_deep_headings = False
+    for line in markdown_content.split('\n'):
         if line.strip().startswith('#'):
             # Look for patterns like ## Teszt Journal ((++teszt-journal))
-            match = re.search(r'^(#+)\s*(.*?)\s*\(\((\++)([^)]+)\)\)', line)
+            match = _HEADING_PARTS_RE.search(line)
             if match:
                 header_level = len(match.group(1))  # Count # symbols
                 title = match.group(2).strip()
@@ -140,12 +156,20 @@ def convert_markdown_to_html(markdown_content):
                 # Count plus signs
                 hierarchy_level = len(pluses)
                 hierarchy_levels[title] = hierarchy_level
+            cleaned_lines.append(clean_heading_line(line))
+            if line.startswith('#######'):
+                has_deep_headings = True
+        else:
+            cleaned_lines.append(line)
     
-    # Now clean the markdown content
-    markdown_content = clean_markdown_content(markdown_content)
+    # Now continue with the cleaned markdown content
+    markdown_content = '\n'.join(cleaned_lines)
     markdown_content = preprocess_links(markdown_content)
-    markdown_content = re.sub(r'^(########)\s*(.*)', r'[[[H8]]] \2', markdown_content, flags=re.MULTILINE)
-    markdown_content = re.sub(r'^(#######)\s*(.*)', r'[[[H7]]] \2', markdown_content, flags=re.MULTILINE)
+    # h7/h8 are rare (deeply nested locations), so the whole-document placeholder
+    # passes only run when the line scan above saw such a heading
+    if has_deep_headings:
+        markdown_content = _DEEP_HEADING_RE.sub(lambda m: f'[[[H{len(m.group(1))}]]] {m.group(2)}', markdown_content)
+    has_placeholders = '[[[H' in markdown_content
     
     html_content = markdown.markdown(markdown_content, extensions=[])
     
@@ -156,18 +180,19 @@ def convert_markdown_to_html(markdown_content):
 
     def replace_h7(match):
         text = match.group(1).strip()
-        text = re.sub(r'^#+\s*', '', text)
+        text = _LEADING_HASHES_RE.sub('', text)
         anchor = create_anchor_label(text)
         return f'<div class="h7" id="{anchor}">{text}</div>'
     def replace_h8(match):
         text = match.group(1).strip()
-        text = re.sub(r'^#+\s*', '', text)
+        text = _LEADING_HASHES_RE.sub('', text)
         anchor = create_anchor_label(text)
         return f'<div class="h8" id="{anchor}">{text}</div>'
-    html_content = re.sub(r'<p>\[\[\[H7\]\]\]\s*([^<]*)</p>', replace_h7, html_content)
-    html_content = re.sub(r'<p>\[\[\[H8\]\]\]\s*([^<]*)</p>', replace_h8, html_content)
-    html_content = re.sub(r'\[\[\[H7\]\]\]\s*([^<\n]*)', replace_h7, html_content)
-    html_content = re.sub(r'\[\[\[H8\]\]\]\s*([^<\n]*)', replace_h8, html_content)
+    if has_placeholders:
+        html_content = re.sub(r'<p>\[\[\[H7\]\]\]\s*([^<]*)</p>', replace_h7, html_content)
+        html_content = re.sub(r'<p>\[\[\[H8\]\]\]\s*([^<]*)</p>', replace_h8, html_content)
+        html_content = re.sub(r'\[\[\[H7\]\]\]\s*([^<\n]*)', replace_h7, html_content)
+        html_content = re.sub(r'\[\[\[H8\]\]\]\s*([^<\n]*)', replace_h8, html_content)
 
     soup = BeautifulSoup(html_content, 'html.parser')
 
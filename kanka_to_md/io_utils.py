@@ -12,22 +12,64 @@ Intended for use in the Kanka to Markdown/HTML workflow.
 """
 
 import os
+import re
 import json
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 from typing import List, Dict, Any
 
+try:
+    import orjson
+except ImportError:  # orjson is optional; without it every file goes through json
+    orjson = None
+
+# orjson turns integers outside the 64-bit range into floats; files with a run
+# of 19+ digits are left to json, which keeps them exact
+_LONG_DIGITS = re.compile(rb'\d{19}')
+
+
+def _json_loads(raw: bytes):
+    """
+    Parse raw file bytes exactly like json.loads on the UTF-8 text. orjson is only a fast
+    path: anything it rejects (BOM, NaN/Infinity, 1e999, invalid UTF-8) is re-parsed by
+    json, which accepts or rejects it with the same errors as before.
+    """
+    if orjson is not None and not _LONG_DIGITS.search(raw):
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(raw.decode("utf-8"))
+
+
+def _read_json_file(file_path: str):
+    """
+    Read and parse one JSON file. Returns (entries, data, error) so worker threads never raise;
+    entries is the parsed list, a dict wrapped in a list, or None for any other payload.
+    """
+    try:
+        with open(file_path, "rb") as f:
+            data = _json_loads(f.read())
+    except Exception as e:
+        return None, None, e
+    if isinstance(data, list):
+        return data, data, None
+    if isinstance(data, dict):
+        return [data], data, None
+    return None, data, None
+
 
 def load_json_entries(folder_path: str) -> List[Dict[str, Any]]:
     """Recursively load all JSON files from folder and subfolders."""
     import logging
     logger = logging.getLogger(__name__)
     
-    entries = []
+    batches = []
     logger.info(f"🔍 Starting to load JSON entries from: {folder_path}")
     
-    file_count = 0
-    loaded_count = 0
     error_count = 0
     
+    json_files = []
     for root, dirs, files in os.walk(folder_path):
         logger.debug(f"📂 Scanning directory: {root}")
         logger.debug(f"📂 Found {len(dirs)} subdirectories: {dirs[:5]}{'...' if len(dirs) > 5 else ''}")
@@ -35,29 +77,28 @@ def load_json_entries(folder_path: str) -> List[Dict[str, Any]]:
         
         for filename in files:
             if filename.endswith(".json"):
-                file_count += 1
-                file_path = os.path.join(root, filename)
-                logger.debug(f"📄 Processing JSON file: {file_path}")
-                
-                try:
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                        if isinstance(data, list):
-                            entries.extend(data)
-                            loaded_count += len(data)
-                            logger.debug(f"✅ Loaded {len(data)} entries from list in {filename}")
-                        elif isinstance(data, dict):
-                            entries.append(data)
-                            loaded_count += 1
-                            logger.debug(f"✅ Loaded 1 entry from dict in {filename}")
-                        else:
-                            logger.warning(f"⚠️ Unexpected data type in {filename}: {type(data)}")
-                except json.JSONDecodeError as e:
-                    error_count += 1
-                    logger.warning(f"⚠️ Skipped invalid JSON: {file_path} - {e}")
-                except Exception as e:
-                    error_count += 1
-                    logger.error(f"❌ Error reading file {file_path}: {e}")
+                json_files.append((filename, os.path.join(root, filename)))
+    file_count = len(json_files)
+    
+    # Reads overlap in threads (file I/O releases the GIL); map keeps walk order
+    max_workers = min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(_read_json_file, [path for _, path in json_files])
+        for (filename, file_path), (batch, data, error) in zip(json_files, results):
+            logger.debug(f"📄 Processing JSON file: {file_path}")
+            if error is not None:
+                error_count += 1
+                if isinstance(error, json.JSONDecodeError):
+                    logger.warning(f"⚠️ Skipped invalid JSON: {file_path} - {error}")
+                else:
+                    logger.error(f"❌ Error reading file {file_path}: {error}")
+            elif batch is None:
+                logger.warning(f"⚠️ Unexpected data type in {filename}: {type(data)}")
+            else:
+                batches.append(batch)
+                logger.debug(f"✅ Loaded {len(batch)} entries from {type(data).__name__} in {filename}")
+    entries = list(chain.from_iterable(batches))
+    loaded_count = len(entries)
     
     logger.info(f"📊 JSON loading summary:")
     logger.info(f"   - Files processed: {file_count}")
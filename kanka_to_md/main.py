@@ -19,9 +19,9 @@ import subprocess
 import time
 import logging
 from datetime import datetime, timezone
-from .io_utils import load_json_entries, save_markdown, load_config
+from .io_utils import load_json_entries, load_config
 from .entity_processing import (
-    build_entity_map, get_type_id_sets, filter_entities_by_type, filter_entities_by_type_dict, build_character_id_to_entity_id
+    build_indexes, get_type_id_sets, filter_entities_by_type
 )
 from .worldbook_generator import generate_worldbook
 from .kanka_function import fetch_and_save_updated_entities, save_last_run_time
@@ -90,9 +90,9 @@ def process_entities(INPUT_FOLDER, logger):
     - Notes (lore, background information)
     - Races (playable races, monster types)
     """
-    from .io_utils import load_json_entries, save_markdown, load_config
+    from .io_utils import load_json_entries, load_config
     from .entity_processing import (
-        build_entity_map, get_type_id_sets, filter_entities_by_type, filter_entities_by_type_dict, build_character_id_to_entity_id
+        build_indexes, get_type_id_sets, filter_entities_by_type
     )
     
     # Add detailed path logging
@@ -270,11 +270,24 @@ def process_entities(INPUT_FOLDER, logger):
     
     type_id_sets = get_type_id_sets()
     
+    # One pass over the entries builds the entity map, the per-type_id buckets
+    # and the character id mapping used below
+    entity_map, entries_by_type_id, character_id_to_entity_id = build_indexes(
+        entries, type_id_sets['CHARACTER_TYPE_IDS'])
+    
+    def of_type(type_ids):
+        if len(type_ids) == 1:
+            return list(entries_by_type_id.get(next(iter(type_ids)), ()))
+        # Keep the original entry order when several type_ids share a section
+        return filter_entities_by_type(entries, type_ids)
+    
+    def of_type_dict(type_ids):
+        return {e['entity']['id']: e for e in of_type(type_ids)}
+    
     # Define labels for each entity type
     type_labels = {
         'locations': 'Locations',
         'characters': 'Characters', 
-        'charlocations': 'Character Locations',
         'organizations': 'Organizations',
         'events': 'Events',
         'notes': 'Notes',
@@ -295,38 +308,37 @@ def process_entities(INPUT_FOLDER, logger):
         if key.endswith('_DICT_IDS'):
             continue
         if key == 'LOCATION_TYPE_IDS':
-            entities_by_type['locations'] = filter_entities_by_type_dict(entries, type_ids)
-            entities_by_type['charlocations'] = filter_entities_by_type_dict(entries, type_ids)
+            entities_by_type['locations'] = of_type_dict(type_ids)
         elif key == 'CHARACTER_TYPE_IDS':
-            entities_by_type['characters'] = filter_entities_by_type(entries, type_ids)
+            entities_by_type['characters'] = of_type(type_ids)
         elif key == 'ORGANIZATION_TYPE_IDS':
-            entities_by_type['organizations'] = filter_entities_by_type(entries, type_ids)
+            entities_by_type['organizations'] = of_type(type_ids)
         elif key == 'EVENT_TYPE_IDS':
-            entities_by_type['events'] = filter_entities_by_type(entries, type_ids)
+            entities_by_type['events'] = of_type(type_ids)
         elif key == 'NOTE_TYPE_IDS':
-            entities_by_type['notes'] = filter_entities_by_type(entries, type_ids)
+            entities_by_type['notes'] = of_type(type_ids)
         elif key == 'ITEM_TYPE_IDS':
-            entities_by_type['items'] = filter_entities_by_type(entries, type_ids)
+            entities_by_type['items'] = of_type(type_ids)
         elif key == 'FAMILY_TYPE_IDS':
-            entities_by_type['families'] = filter_entities_by_type(entries, type_ids)
+            entities_by_type['families'] = of_type(type_ids)
         elif key == 'RACE_TYPE_IDS':
-            entities_by_type['races'] = filter_entities_by_type(entries, type_ids)
+            entities_by_type['races'] = of_type(type_ids)
         elif key == 'JOURNAL_TYPE_IDS':
-            entities_by_type['journals'] = filter_entities_by_type(entries, type_ids)
+            entities_by_type['journals'] = of_type(type_ids)
         elif key == 'TAG_TYPE_IDS':
-            entities_by_type['tags'] = filter_entities_by_type(entries, type_ids)
+            entities_by_type['tags'] = of_type(type_ids)
         elif key == 'QUEST_TYPE_IDS':
-            entities_by_type['quests'] = filter_entities_by_type(entries, type_ids)
+            entities_by_type['quests'] = of_type(type_ids)
         elif key == 'MAP_TYPE_IDS':
-            entities_by_type['maps'] = filter_entities_by_type(entries, type_ids)
+            entities_by_type['maps'] = of_type(type_ids)
         elif key == 'TIMELINE_TYPE_IDS':
-            entities_by_type['timelines'] = filter_entities_by_type(entries, type_ids)
+            entities_by_type['timelines'] = of_type(type_ids)
         elif key == 'CALENDAR_TYPE_IDS':
-            entities_by_type['calendars'] = filter_entities_by_type(entries, type_ids)
+            entities_by_type['calendars'] = of_type(type_ids)
         else:
             # Handle any other types generically
             type_name = key.replace('_TYPE_IDS', '').lower()
-            entities_by_type[type_name] = filter_entities_by_type(entries, type_ids)
+            entities_by_type[type_name] = of_type(type_ids)
     
     # Log counts for each type
     for entity_type, entities in entities_by_type.items():
@@ -348,10 +360,6 @@ def process_entities(INPUT_FOLDER, logger):
         except Exception as e:
             logger.warning(f"Could not load campaign.json: {e}")
     
-    # Build entity map and character mappings
-    entity_map = build_entity_map(entries)
-    character_id_to_entity_id = build_character_id_to_entity_id(entries)
-    
     # Add these to the entities dict
     entities_by_type['campaign'] = campaign_data
     entities_by_type['entity_map'] = entity_map
@@ -372,10 +380,21 @@ def generate_markdown(entities, include_private, OUTPUT_FILE, logger, language='
     - Cross-references between related content
     - Proper formatting and structure
     """
-    from .worldbook_generator import generate_worldbook
-    from .io_utils import save_markdown
-    markdown = generate_worldbook(entities, include_private=include_private, include_posts=include_posts, language=language)
-    save_markdown(OUTPUT_FILE, markdown)
+    # Sections are written to the file as they are rendered, so the whole
+    # worldbook never has to exist as one string in memory; the large buffer
+    # turns the many small writes into a few big sequential ones.
+    # Rendering goes to a temp file next to OUTPUT_FILE that only replaces it
+    # once complete, so a failure never leaves a truncated worldbook behind
+    # for the HTML/PDF steps to pick up.
+    tmp_file = f"{OUTPUT_FILE}.tmp"
+    try:
+        with open(tmp_file, "w", encoding="utf-8", buffering=1 << 20) as f:
+            generate_worldbook(entities, include_private=include_private, include_posts=include_posts, language=language, out=f)
+        os.replace(tmp_file, OUTPUT_FILE)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
     logger.info(f"Worldbook generated: {OUTPUT_FILE}")
 
 def convert_to_html(OUTPUT_FILE, logger):
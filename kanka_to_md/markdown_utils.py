@@ -8,13 +8,55 @@ Provides helpers to:
 - Create anchor labels for internal links
 - Escape markdown-sensitive characters
 
+Anchor and escape results are memoized, since the same entity names are
+rendered once as headings and again for every link that points at them.
+
 Intended for use in the Kanka to Markdown/HTML workflow.
 """
 
 import re
 import unicodedata
+from functools import lru_cache
 from bs4 import BeautifulSoup
-from typing import Optional, Dict
+from typing import Callable, Optional, Dict
+
+
+# HTML -> markdown rewrite rules used by convert_mentions_in_html, applied in order.
+# Compiled once at import since they run for every entity and post entry.
+_HTML_TO_MARKDOWN_RULES = [
+    (re.compile(r'<p>(.*?)</p>', re.DOTALL), r'\1\n\n'),
+    (re.compile(r'<br/?>'), '\n'),
+    (re.compile(r'<hr/?>'), '\n---\n'),
+    (re.compile(r'<strong>(.*?)</strong>', re.DOTALL), r'**\1**'),
+    (re.compile(r'<b>(.*?)</b>', re.DOTALL), r'**\1**'),
+    (re.compile(r'<em>(.*?)</em>', re.DOTALL), r'*\1*'),
+    (re.compile(r'<i>(.*?)</i>', re.DOTALL), r'*\1*'),
+    (re.compile(r'<ul>(.*?)</ul>', re.DOTALL), r'\1'),
+    (re.compile(r'<ol>(.*?)</ol>', re.DOTALL), r'\1'),
+    (re.compile(r'<li>(.*?)</li>', re.DOTALL), r'- \1\n'),
+    (re.compile(r'<h1>(.*?)</h1>', re.DOTALL), r'# \1\n\n'),
+    (re.compile(r'<h2>(.*?)</h2>', re.DOTALL), r'## \1\n\n'),
+    (re.compile(r'<h3>(.*?)</h3>', re.DOTALL), r'### \1\n\n'),
+    (re.compile(r'<h4>(.*?)</h4>', re.DOTALL), r'#### \1\n\n'),
+    (re.compile(r'<h5>(.*?)</h5>', re.DOTALL), r'##### \1\n\n'),
+    (re.compile(r'<h6>(.*?)</h6>', re.DOTALL), r'###### \1\n\n'),
+    (re.compile(r'<span[^>]*>(.*?)</span>', re.DOTALL), r'\1'),
+    (re.compile(r'\n\s*\n\s*\n'), '\n\n'),
+]
+
+# Kanka mention token, e.g. [character:12345]
+_MENTION_RE = re.compile(r'\[(\w+):(\d+)\]')
+
+# Accented Latin letters (Latin-1 and Latin Extended-A/B) mapped to what NFKD
+# plus dropping combining marks turns them into, so create_anchor_label can
+# fold names like "Árvíztűrő" with one translate() instead of normalizing.
+_ANCHOR_FOLD_TABLE = str.maketrans({
+    c: ''.join(d for d in unicodedata.normalize('NFKD', c) if not unicodedata.combining(d))
+    for c in map(chr, range(0xC0, 0x250))
+    if unicodedata.normalize('NFKD', c) != c
+})
+_WHITESPACE_RE = re.compile(r'\s+')
+_NON_SLUG_RE = re.compile(r'[^\w\-]')
 
 
 def convert_mentions_in_html(html_text: str) -> str:
@@ -27,52 +69,60 @@ def convert_mentions_in_html(html_text: str) -> str:
         else:
             a_tag.unwrap()  # fallback
     result = str(soup)
-    result = re.sub(r'<p>(.*?)</p>', r'\1\n\n', result, flags=re.DOTALL)
-    result = re.sub(r'<br/?>', '\n', result)
-    result = re.sub(r'<hr/?>', '\n---\n', result)
-    result = re.sub(r'<strong>(.*?)</strong>', r'**\1**', result, flags=re.DOTALL)
-    result = re.sub(r'<b>(.*?)</b>', r'**\1**', result, flags=re.DOTALL)
-    result = re.sub(r'<em>(.*?)</em>', r'*\1*', result, flags=re.DOTALL)
-    result = re.sub(r'<i>(.*?)</i>', r'*\1*', result, flags=re.DOTALL)
-    result = re.sub(r'<ul>(.*?)</ul>', r'\1', result, flags=re.DOTALL)
-    result = re.sub(r'<ol>(.*?)</ol>', r'\1', result, flags=re.DOTALL)
-    result = re.sub(r'<li>(.*?)</li>', r'- \1\n', result, flags=re.DOTALL)
-    result = re.sub(r'<h1>(.*?)</h1>', r'# \1\n\n', result, flags=re.DOTALL)
-    result = re.sub(r'<h2>(.*?)</h2>', r'## \1\n\n', result, flags=re.DOTALL)
-    result = re.sub(r'<h3>(.*?)</h3>', r'### \1\n\n', result, flags=re.DOTALL)
-    result = re.sub(r'<h4>(.*?)</h4>', r'#### \1\n\n', result, flags=re.DOTALL)
-    result = re.sub(r'<h5>(.*?)</h5>', r'##### \1\n\n', result, flags=re.DOTALL)
-    result = re.sub(r'<h6>(.*?)</h6>', r'###### \1\n\n', result, flags=re.DOTALL)
-    result = re.sub(r'<span[^>]*>(.*?)</span>', r'\1', result, flags=re.DOTALL)
-    result = re.sub(r'\n\s*\n\s*\n', '\n\n', result)
+    for pattern, replacement in _HTML_TO_MARKDOWN_RULES:
+        result = pattern.sub(replacement, result)
     return result
 
 
+@lru_cache(maxsize=8192)
 def create_anchor_label(name: Optional[str]) -> str:
     """Create a markdown-friendly, ASCII-only anchor slug from name."""
     if not name:
         return ""
-    slug = name.strip().lower()
-    slug = unicodedata.normalize('NFKD', slug)
-    slug = ''.join(c for c in slug if not unicodedata.combining(c))
-    slug = re.sub(r'\s+', '-', slug)
-    slug = re.sub(r'[^\w\-]', '', slug)
+    slug = name.strip().lower().translate(_ANCHOR_FOLD_TABLE)
+    # Only names with characters outside the fold table need the full
+    # normalization; for the rest it would be a no-op
+    if not slug.isascii():
+        slug = unicodedata.normalize('NFKD', slug)
+        slug = ''.join(c for c in slug if not unicodedata.combining(c))
+    slug = _WHITESPACE_RE.sub('-', slug)
+    slug = _NON_SLUG_RE.sub('', slug)
     return slug
 
 
+def make_mention_replacer(entity_map: Dict[int, Dict[str, str]]) -> Callable[[str], str]:
+    """
+    Return a function replacing Kanka mentions in text using entity_map.
+    The markdown for each mentioned id is built on first use and reused for
+    every later mention, so one replacer should serve a whole rendering pass.
+    """
+    links: Dict[str, str] = {}
+
+    def replacer(match):
+        raw_id = match.group(2)
+        link = links.get(raw_id)
+        if link is None:
+            entity_id = int(raw_id)
+            entity = entity_map.get(entity_id)
+            if entity:
+                anchor = create_anchor_label(entity['name'])
+                link = f"[{entity['name']}](#{anchor})"
+            else:
+                link = f"**Entity_{entity_id}**"
+            links[raw_id] = link
+        return link
+
+    def replace(text: str) -> str:
+        return _MENTION_RE.sub(replacer, text)
+    return replace
+
+
 def replace_mentions(text: str, entity_map: Dict[int, Dict[str, str]]) -> str:
     """Replace Kanka mentions like [character:12345] with markdown links."""
-    def replacer(match):
-        entity_id = int(match.group(2))
-        entity = entity_map.get(entity_id)
-        if entity:
-            anchor = create_anchor_label(entity['name'])
-            return f"[{entity['name']}](#{anchor})"
-        else:
-            return f"**Entity_{entity_id}**"
-    return re.sub(r'\[(\w+):(\d+)\]', replacer, text)
+    return make_mention_replacer(entity_map)(text)
 
 
+@lru_cache(maxsize=8192)
 def md_escape(text: Optional[str]) -> str:
     """Escape underscores and other markdown sensitive characters."""
     if not text:
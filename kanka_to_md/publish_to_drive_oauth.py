@@ -15,7 +15,9 @@ Intended for use in the Kanka to Markdown/HTML/PDF workflow.
 
 import os
 import pickle
+import atexit
 import logging
+import logging.handlers
 import sys
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
@@ -24,13 +26,24 @@ from google.auth.transport.requests import Request
 from google.auth.exceptions import RefreshError
 
 # Logging setup (if not already set by main)
+# File output is buffered in memory and flushed on errors or at exit, so the
+# info-level progress messages don't each hit the disk during the upload.
 if not logging.getLogger().hasHandlers():
     os.makedirs('logs', exist_ok=True)
+    _log_format = '%(asctime)s [%(levelname)s] %(message)s'
+    _file_handler = logging.FileHandler('logs/realmpress.log', encoding='utf-8')
+    _file_handler.setFormatter(logging.Formatter(_log_format))
+    _buffered_file_handler = logging.handlers.MemoryHandler(
+        capacity=64,
+        flushLevel=logging.ERROR,
+        target=_file_handler
+    )
+    atexit.register(_buffered_file_handler.flush)
     logging.basicConfig(
         level=logging.INFO,
-        format='%(asctime)s [%(levelname)s] %(message)s',
+        format=_log_format,
         handlers=[
-            logging.FileHandler('logs/realmpress.log', encoding='utf-8'),
+            _buffered_file_handler,
             logging.StreamHandler()
         ]
     )
@@ -56,7 +69,7 @@ def clear_expired_token():
             logger.info("🔄 You will need to re-authenticate with Google on the next run.")
             return True
         except Exception as e:
-            logger.error(f"Failed to remove expired token: {e}")
+            logger.error("Failed to remove expired token: %s", e)
             return False
     return True
 
@@ -80,7 +93,7 @@ def get_drive_service():
                 creds = pickle.load(token)
             logger.info("📁 Loaded existing OAuth token.")
         except Exception as e:
-            logger.warning(f"Failed to load existing token: {e}")
+            logger.warning("Failed to load existing token: %s", e)
             clear_expired_token()
             creds = None
     
@@ -103,11 +116,11 @@ def get_drive_service():
             return build('drive', 'v3', credentials=creds)
             
         except RefreshError as e:
-            logger.warning(f"❌ Token refresh failed: {e}")
+            logger.warning("❌ Token refresh failed: %s", e)
             logger.info("🔄 This usually means the refresh token has expired.")
             clear_expired_token()
         except Exception as e:
-            logger.error(f"❌ Unexpected error during token refresh: {e}")
+            logger.error("❌ Unexpected error during token refresh: %s", e)
             clear_expired_token()
     
     # Need to get new token through OAuth flow
@@ -132,7 +145,7 @@ def get_drive_service():
         return build('drive', 'v3', credentials=creds)
         
     except Exception as e:
-        logger.error(f"❌ OAuth authentication failed: {e}")
+        logger.error("❌ OAuth authentication failed: %s", e)
         logger.error("Please check your OAuth credentials and try again.")
         raise
 
@@ -146,10 +159,10 @@ def load_file_id():
                 data = json.load(f)
                 file_id = data.get('file_id')
                 if file_id:
-                    logger.info(f"📄 Found existing file ID: {file_id}")
+                    logger.info("📄 Found existing file ID: %s", file_id)
                 return file_id
         except Exception as e:
-            logger.warning(f"Failed to load file ID: {e}")
+            logger.warning("Failed to load file ID: %s", e)
     return None
 
 
@@ -159,9 +172,9 @@ def save_file_id(file_id):
         with open(FILE_ID_PATH, 'w') as f:
             import json
             json.dump({'file_id': file_id}, f)
-        logger.info(f"💾 Saved file ID: {file_id}")
+        logger.info("💾 Saved file ID: %s", file_id)
     except Exception as e:
-        logger.error(f"Failed to save file ID: {e}")
+        logger.error("Failed to save file ID: %s", e)
 
 
 def upload_or_update_file():
@@ -169,7 +182,7 @@ def upload_or_update_file():
     try:
         service = get_drive_service()
     except Exception as e:
-        logger.error(f"❌ Failed to authenticate with Google Drive: {e}")
+        logger.error("❌ Failed to authenticate with Google Drive: %s", e)
         logger.error("Please check your OAuth credentials and try again.")
         return False
     
@@ -189,7 +202,7 @@ def upload_or_update_file():
     # Try to update existing file
     if file_id:
         try:
-            logger.info(f"🔄 Updating existing file on Drive (ID: {file_id})...")
+            logger.info("🔄 Updating existing file on Drive (ID: %s)...", file_id)
             updated_file = service.files().update(
                 fileId=file_id,
                 media_body=media,
@@ -198,7 +211,7 @@ def upload_or_update_file():
             logger.info("✅ File updated successfully.")
             file_id = updated_file['id']
         except Exception as e:
-            logger.warning(f"⚠️ Failed to update file: {e}")
+            logger.warning("⚠️ Failed to update file: %s", e)
             logger.info("🔄 Will try to upload as new file.")
             file_id = None
 
@@ -215,7 +228,7 @@ def upload_or_update_file():
             logger.info("✅ File uploaded successfully.")
             save_file_id(file_id)
         except Exception as e:
-            logger.error(f"❌ Failed to upload file: {e}")
+            logger.error("❌ Failed to upload file: %s", e)
             return False
 
     # Set sharing permissions
@@ -233,18 +246,18 @@ def upload_or_update_file():
             ).execute()
             logger.info("✅ Sharing permissions set.")
         except Exception as e:
-            logger.warning(f"⚠️ Failed to set sharing permissions: {e}")
+            logger.warning("⚠️ Failed to set sharing permissions: %s", e)
 
     # Get and display file links
     try:
         file = service.files().get(fileId=file_id, fields='webViewLink, webContentLink').execute()
         logger.info("🎉 Upload completed successfully!")
-        logger.info(f"📄 File is available at: {file['webViewLink']}")
-        logger.info(f"⬇️ Direct download link: {file['webContentLink']}")
+        logger.info("📄 File is available at: %s", file['webViewLink'])
+        logger.info("⬇️ Direct download link: %s", file['webContentLink'])
         logger.info("💡 Share this link. Future updates will keep the same link!")
         return True
     except Exception as e:
-        logger.error(f"❌ Failed to get file links: {e}")
+        logger.error("❌ Failed to get file links: %s", e)
         return False
 
 
@@ -254,13 +267,13 @@ def main():
     
     # Check if file exists
     if not os.path.exists(FILE_PATH):
-        logger.error(f"❌ File not found: {FILE_PATH}")
+        logger.error("❌ File not found: %s", FILE_PATH)
         logger.error("Please ensure the file exists before running this script.")
         return False
     
     # Check if OAuth credentials exist
     if not os.path.exists(CREDENTIALS_PATH):
-        logger.error(f"❌ OAuth client credentials not found: {CREDENTIALS_PATH}")
+        logger.error("❌ OAuth client credentials not found: %s", CREDENTIALS_PATH)
         logger.error("Please set up your Google OAuth credentials first.")
         return False
     
@@ -276,7 +289,7 @@ def main():
         logger.info("⏹️ Upload cancelled by user.")
         return False
     except Exception as e:
-        logger.error(f"❌ Unexpected error during upload: {e}")
+        logger.error("❌ Unexpected error during upload: %s", e)
         return False
 
 
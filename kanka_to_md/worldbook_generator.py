@@ -1,24 +1,113 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, TextIO
 from collections import defaultdict
-from .markdown_utils import create_anchor_label, convert_mentions_in_html, replace_mentions, md_escape
+from itertools import filterfalse
+from operator import attrgetter
+from types import MappingProxyType
+from .markdown_utils import create_anchor_label, convert_mentions_in_html, make_mention_replacer, md_escape
 from .localization import get_chapter_title, get_chapter_slug, get_ui_text, validate_language
-import re
 import os
+import io
 
-def get_entity_image_path(entity_data, gallery_dir):
+# Field holding the parent's id for each hierarchical entity type
+# (types not listed here fall back to 'parent_id')
+PARENT_ID_FIELDS = {
+    'journal': 'journal_id',
+    'location': 'location_id',
+    'race': 'race_id',
+    'quest': 'quest_id',
+    'note': 'note_id',
+    'family': 'family_id',
+    'organisation': 'organisation_id',
+    'item': 'item_id',
+    'calendar': 'calendar_id',
+    'timeline': 'timeline_id',
+    'map': 'map_id',
+    'tag': 'tag_id',
+}
+
+# Downloaded entity images live next to the exported JSON files
+GALLERY_DIR = os.path.join(os.path.dirname(__file__), 'kanka_jsons', 'gallery')
+
+# Read-only stand-in for a missing nested 'entity' dict, so lookups on it
+# don't allocate a fresh {} each time
+EMPTY_ENTITY = MappingProxyType({})
+
+# Post bodies that carry no visible content (Kanka saves an empty editor as '<br>')
+EMPTY_POST_ENTRIES = frozenset(['<br>', '<br/>', '<br />', ''])
+
+# Chapters and UI strings used by generate_worldbook; their translations are
+# resolved once per call instead of on every entity
+CHAPTER_TYPES = (
+    'locations', 'characters', 'events', 'organizations', 'notes', 'items',
+    'families', 'races', 'journals', 'quests', 'tags', 'maps', 'calendars',
+    'timelines',
+)
+
+UI_TEXT_KEYS = (
+    'age', 'characters_at_location', 'dead', 'details', 'excerpt', 'family',
+    'family_members', 'gender', 'generation_settings', 'location', 'members',
+    'no', 'private', 'private_entities_display', 'race', 'tags', 'type',
+    'unknown_member', 'unnamed_post', 'yes',
+)
+
+def entity_sort_name(obj):
+    """Sort by the object's name, falling back to its nested entity's name."""
+    return obj.get('name') or (obj.get('entity') or EMPTY_ENTITY).get('name', '')
+
+def post_sort_key(post):
+    """Sort posts by position if available, otherwise by creation date."""
+    return (post.get('position', 0), post.get('created_at', ''))
+
+def is_private_obj(obj):
+    """Return True if the object or its nested entity is marked private."""
+    if obj.get('is_private', 0) == 1:
+        return True
+    # Only look at the nested entity when the object itself isn't private
+    ent = obj.get('entity')
+    return bool(ent) and ent.get('is_private', 0) == 1
+
+class GalleryIndex:
+    """
+    Listing of the gallery directory, taken once per generation run.
+    Args:
+        gallery_dir: Directory containing downloaded images
+    """
+    __slots__ = ('files', 'names', 'by_uuid')
+    
+    def __init__(self, gallery_dir):
+        # JSON metadata files are never images, so they are dropped up front
+        self.files = [f for f in os.listdir(gallery_dir) if not f.endswith('.json')]
+        self.names = frozenset(self.files)
+        # Image files are saved as '<uuid>.<ext>'; keep the first file per uuid
+        self.by_uuid = {}
+        for f in self.files:
+            if '.' in f:
+                self.by_uuid.setdefault(f.split('.', 1)[0], f)
+    
+    def find_prefixed(self, prefix):
+        """Return the first image file whose name starts with prefix, or None."""
+        for f in self.files:
+            if f.startswith(prefix):
+                return f
+        return None
+
+def get_entity_image_path(entity_data, gallery):
     """
     Get the image path for an entity if it has an associated image.
     Args:
         entity_data: Entity data dictionary
-        gallery_dir: Directory containing downloaded images
+        gallery: GalleryIndex of the downloaded images (or the gallery directory)
     Returns:
         str: Relative path to image file, or None if no image
     """
+    if not isinstance(gallery, GalleryIndex):
+        gallery = GalleryIndex(gallery)
+    
     # Check if entity has an image UUID (try both root and entity field)
     image_uuid = entity_data.get('image_uuid')
     if not image_uuid:
         # Try to get from entity field
-        entity = entity_data.get('entity', {})
+        entity = entity_data.get('entity') or EMPTY_ENTITY
         image_uuid = entity.get('image_uuid')
     
     # For campaigns, also check the 'image' field
@@ -29,86 +118,97 @@ def get_entity_image_path(entity_data, gallery_dir):
             # Extract filename from path
             filename = os.path.basename(image_path)
             # Look for the image file in the gallery directory
-            for gallery_file in os.listdir(gallery_dir):
-                if gallery_file == filename:
-                    # Skip JSON metadata files, only return actual image files
-                    if not gallery_file.endswith('.json'):
-                        # Return relative path from kanka_jsons directory
-                        return f"gallery/{gallery_file}"
+            if filename in gallery.names:
+                # Return relative path from kanka_jsons directory
+                return f"gallery/{filename}"
             
             # If not found with exact match, try partial match (for cases where extension might differ)
-            filename_without_ext = os.path.splitext(filename)[0]
-            for gallery_file in os.listdir(gallery_dir):
-                if gallery_file.startswith(filename_without_ext) and not gallery_file.endswith('.json'):
-                    # Return relative path from kanka_jsons directory
-                    return f"gallery/{gallery_file}"
+            gallery_file = gallery.find_prefixed(os.path.splitext(filename)[0])
+            if gallery_file:
+                return f"gallery/{gallery_file}"
     
     if not image_uuid:
         return None
     
     # Look for the image file in the gallery directory
-    for filename in os.listdir(gallery_dir):
-        if filename.startswith(image_uuid) and '.' in filename:
-            # Skip JSON metadata files, only return actual image files
-            if not filename.endswith('.json'):
-                # Return relative path from kanka_jsons directory
-                return f"gallery/{filename}"
+    filename = gallery.by_uuid.get(image_uuid)
+    if filename is None:
+        # Files named with the uuid plus a suffix before the extension
+        filename = next((f for f in gallery.files if f.startswith(image_uuid) and '.' in f), None)
+    if filename:
+        # Return relative path from kanka_jsons directory
+        return f"gallery/{filename}"
     
     return None
 
-def get_entity_image_markdown(entity_data, gallery_dir, entity_name):
+def get_entity_image_markdown(entity_data, gallery, entity_name):
     """
     Generate markdown image syntax for an entity if it has an image.
     Args:
         entity_data: Entity data dictionary
-        gallery_dir: Directory containing downloaded images
+        gallery: GalleryIndex of the downloaded images (or the gallery directory)
         entity_name: Name of the entity for alt text
     Returns:
         str: Markdown image syntax or empty string if no image
     """
-    image_path = get_entity_image_path(entity_data, gallery_dir)
+    image_path = get_entity_image_path(entity_data, gallery)
     if not image_path:
         return ""
     
     # Generate markdown image syntax
     return f"\n![{entity_name}]({image_path})\n"
 
-def paginate_and_columnize(lines, lines_per_page=55):
-    pages = []
-    current = []
-    for line in lines:
-        current.append(line)
-        if len(current) == lines_per_page:
-            pages.append(current)
-            current = []
-    if current:
-        pages.append(current)
-    # Now, for each page, split into two columns
-    result = []
-    for page in pages:
-        col_break = lines_per_page // 2
-        col1 = page[:col_break]
-        col2 = page[col_break:]
-        # Remove trailing empty lines in each column
-        while col1 and col1[-1].strip() == '':
-            col1.pop()
-        while col2 and col2[-1].strip() == '':
-            col2.pop()
-        result.append('\n'.join(col1) + '\n/\n' + '\n'.join(col2))
-    return result
+def generate_worldbook(entities: dict, include_private=False, include_posts=True, language: str = 'en',
+                       out: Optional[TextIO] = None) -> Optional[str]:
+    """
+    Render the worldbook markdown.
+    With `out` given the markdown is streamed into it and None is returned;
+    otherwise it is collected and returned as a single string.
+    """
+    if out is not None:
+        generate_worldbook_into(out, entities, include_private=include_private, include_posts=include_posts, language=language)
+        return None
+    buf = io.StringIO()
+    generate_worldbook_into(buf, entities, include_private=include_private, include_posts=include_posts, language=language)
+    return buf.getvalue()
 
-def generate_worldbook(entities: dict, include_private=False, include_posts=True, language: str = 'en') -> str:
+def generate_worldbook_into(out: TextIO, entities: dict, include_private=False, include_posts=True, language: str = 'en') -> None:
+    """Render the worldbook markdown section by section into the text stream `out`."""
     # Validate and set language
     language = validate_language(language)
+    titles = {key: get_chapter_title(key, language) for key in CHAPTER_TYPES}
+    slugs = {key: get_chapter_slug(key, language) for key in CHAPTER_TYPES}
+    ui = {key: get_ui_text(key, language) for key in UI_TEXT_KEYS}
+    # The (label, value) pair every private entity adds to its details block
+    private_detail = (ui['private'], ui['yes'])
+
+    # The gallery is checked and listed once for the whole run; None when
+    # there are no downloaded images
+    gallery = GalleryIndex(GALLERY_DIR) if os.path.isdir(GALLERY_DIR) else None
+
+    # Shared "Details" block: a rule, the localized label and one bullet per
+    # (label, value) pair; `lead` is the newlines written before the rule and
+    # `gap` the ones between the label and the list
+    def render_details(pairs, lead='\n\n', gap='\n\n'):
+        # A list comprehension: join() would materialize a generator anyway
+        items = ''.join([f"- **{label}:** {value}\n" for label, value in pairs])
+        return f"{lead}---\n**{ui['details']}:**{gap}{items}\n"
+
+    # Entry HTML -> markdown with mentions resolved. Not cached: entry texts are
+    # essentially unique, so a cache would only hold every rendered entry in
+    # memory. Callers skip empty entries instead of paying for the call
+    def render_entry(entry_html):
+        return replace_mentions(convert_mentions_in_html(entry_html))
     
     # Unpack known types for legacy rendering order
     campaign = entities.get('campaign', {})
     locations = entities.get('locations', {})
     characters = entities.get('characters', [])
-    charlocations = entities.get('charlocations', {})
     organizations = entities.get('organizations', [])
     events = entities.get('events', [])
     entity_map = entities.get('entity_map', {})
+    # Mention links are built once per entity id for the whole run
+    replace_mentions = make_mention_replacer(entity_map)
     character_id_to_entity_id = entities.get('character_id_to_entity_id', {})
     notes = entities.get('notes', [])
     items = entities.get('items', [])
@@ -123,65 +223,33 @@ def generate_worldbook(entities: dict, include_private=False, include_posts=True
 
     # Generic tree node class for all hierarchical entities
     class TreeNode:
+        # Fixed attribute layout: no per-node __dict__ for large entity lists
+        __slots__ = ('entity', 'children', 'depth', 'parent_id', 'entity_id', 'name')
+        
         def __init__(self, entity_data):
             self.entity = entity_data
             self.children = []
             self.depth = 0
             # Handle different parent field names for different entity types
-            self.parent_id = None
-            entity_type = entity_data.get('entity', {}).get('type', '')
-            if entity_type is None:
-                entity_type = ''
-            entity_type = entity_type.lower()
-            
-            if entity_type == 'journal':
-                # Journals use journal_id for parent relationship
-                self.parent_id = entity_data.get('journal_id')
-            elif entity_type == 'location':
-                # Locations use location_id for parent relationship
-                self.parent_id = entity_data.get('location_id')
-            elif entity_type == 'race':
-                # Races use race_id for parent relationship
-                self.parent_id = entity_data.get('race_id')
-            elif entity_type == 'quest':
-                # Quests use quest_id for parent relationship
-                self.parent_id = entity_data.get('quest_id')
-            elif entity_type == 'note':
-                # Notes use note_id for parent relationship
-                self.parent_id = entity_data.get('note_id')
-            elif entity_type == 'family':
-                # Families use family_id for parent relationship
-                self.parent_id = entity_data.get('family_id')
-            elif entity_type == 'organisation':
-                # Organizations use organisation_id for parent relationship
-                self.parent_id = entity_data.get('organisation_id')
-            elif entity_type == 'item':
-                # Items use item_id for parent relationship
-                self.parent_id = entity_data.get('item_id')
-            elif entity_type == 'calendar':
-                # Calendars use calendar_id for parent relationship
-                self.parent_id = entity_data.get('calendar_id')
-            elif entity_type == 'timeline':
-                # Timelines use timeline_id for parent relationship
-                self.parent_id = entity_data.get('timeline_id')
-            elif entity_type == 'map':
-                # Maps use map_id for parent relationship
-                self.parent_id = entity_data.get('map_id')
-            elif entity_type == 'tag':
-                # Tags use tag_id for parent relationship
-                self.parent_id = entity_data.get('tag_id')
+            ent = entity_data.get('entity') or EMPTY_ENTITY
+            entity_type = (ent.get('type') or '').lower()
+            parent_field = PARENT_ID_FIELDS.get(entity_type)
+            if parent_field:
+                self.parent_id = entity_data.get(parent_field)
             else:
                 # Default to parent_id for other types
-                self.parent_id = entity_data.get('parent_id') or entity_data.get('entity', {}).get('parent_id')
+                self.parent_id = entity_data.get('parent_id') or ent.get('parent_id')
             
-            self.entity_id = entity_data.get('id') or entity_data.get('entity', {}).get('id')
+            self.entity_id = entity_data.get('id') or ent.get('id')
+            # Cached once so sorting by name doesn't re-walk the dicts
+            self.name = entity_data.get('name') or ent.get('name', 'Unnamed')
         
         def add_child(self, child_node):
             self.children.append(child_node)
             child_node.depth = self.depth + 1
         
         def get_name(self):
-            return self.entity.get('name') or self.entity.get('entity', {}).get('name', 'Unnamed')
+            return self.name
         
         def get_id(self):
             return self.entity_id
@@ -207,178 +275,146 @@ def generate_worldbook(entities: dict, include_private=False, include_posts=True
             else:
                 root_nodes.append(node)
         
+        # Sort once here so the traversal can walk children in name order as-is
+        by_name = attrgetter('name')
+        for node in nodes.values():
+            node.children.sort(key=by_name)
+        root_nodes.sort(key=by_name)
+        
         return root_nodes
     
-    # Write hierarchical entity with proper indentation
-    def write_hierarchical_entity(entity, depth=0, max_depth=5):
+    # Writes an entity's visible posts to `buf` as headings one level below
+    # the entity itself (h3 for a depth-0 entity); shared by every writer with posts.
+    # `gap` separates heading and body (characters have always used two blank lines)
+    def write_posts(ent, parent_name, buf, depth=0, gap='\n\n'):
+        posts = ent.get('posts', [])
+        if not (posts and include_posts):
+            return
+        # Filter once, before sorting: skip private posts if include_private is
+        # False, and posts with empty or minimal content (like just <br>)
+        # visibility_id: 1 = Public, 2 = Private (Admin only), 3 = Private (Self only)
+        posts = [post for post in posts
+                 if (include_private or post.get('visibility_id', 1) == 1)
+                 and (post.get('entry') or '').strip() not in EMPTY_POST_ENTRIES]
+        post_pluses = '+' * (depth + 3)
+        
+        for post in sorted(posts, key=post_sort_key):
+            post_name = post.get('name', ui['unnamed_post'])
+            post_entry = post['entry']
+            post_anchor = create_anchor_label(f"{parent_name}_{post_name}")
+            buf.write(f"### {md_escape(post_name)} (({post_pluses}{post_anchor})){gap}{render_entry(post_entry)}\n\n---\n\n")
+    
+    # Family member list: one linked bullet per member, joined in one go
+    def render_family_members(pivot_members):
+        parts = [f"**{ui['family_members']}:**\n\n"]
+        for member in pivot_members:
+            char_id = member.get('character_id')
+            member_link = member_links.get(char_id)
+            if member_link:
+                char_label, char_anchor = member_link
+                parts.append(f"- [{char_label}](#{char_anchor})\n")
+            else:
+                parts.append(f"- **Unknown member {char_id}**\n")
+        parts.append("\n")
+        return ''.join(parts)
+    
+    # Write hierarchical entity with proper indentation; every line written
+    # to `buf` is newline-terminated
+    def write_hierarchical_entity(entity, buf, depth=0, max_depth=5):
         if depth > max_depth:
-            return []
+            return
         
-        lines = []
-        ent = entity.get('entity', {})
+        ent = entity.get('entity') or EMPTY_ENTITY
         name = entity.get('name') or ent.get('name', 'Unnamed')
         anchor = create_anchor_label(name)
         pluses = '+' * (depth + 2)
         
         # Use proper markdown header without indentation spaces
         # The indentation will be handled by CSS in the HTML output
-        lines.append(f"## {md_escape(name)} (({pluses}{anchor}))")
-        lines.append("")
+        buf.write(f"## {md_escape(name)} (({pluses}{anchor}))\n\n")
         
         # Add entity image if available
-        gallery_dir = os.path.join(os.path.dirname(__file__), 'kanka_jsons', 'gallery')
-        if os.path.exists(gallery_dir):
-            image_markdown = get_entity_image_markdown(entity, gallery_dir, name)
+        if gallery is not None:
+            image_markdown = get_entity_image_markdown(entity, gallery, name)
             if image_markdown:
-                lines.append(image_markdown)
+                buf.write(f"{image_markdown}\n")
         
         entry_html = entity.get('entry') or ent.get('entry') or ''
-        entry_cleaned = convert_mentions_in_html(entry_html)
-        entry_md = replace_mentions(entry_cleaned, entity_map)
+        entry_md = render_entry(entry_html) if entry_html else ''
         
         details = []
-        if is_private_obj(entity):
-            details.append(f"- **{get_ui_text('private', language)}:** {get_ui_text('yes', language)}")
+        if entity.get('is_private', 0) == 1 or ent.get('is_private', 0) == 1:
+            details.append(private_detail)
         
         # Add location as a markdown link if available
-        loc_name = None
-        if entity.get('location_id') and entity.get('location_id') in location_by_id:
-            loc = location_by_id[entity['location_id']]
-            loc_name = loc.get('name') or loc.get('entity', {}).get('name')
-        if loc_name:
-            loc_anchor = create_anchor_label(loc_name)
-            details.append(f"- **{get_ui_text('location', language)}:** [{md_escape(loc_name)}](#{loc_anchor})")
-        
-        if 'type' in ent and ent['type']:
-            details.append(f"- **{get_ui_text('type', language)}:** {md_escape(ent['type'])}")
-        
-        if ent.get('tags'):
-            tag_names = []
-            for tag in ent.get('tags', []):
-                if isinstance(tag, dict) and 'name' in tag:
-                    tag_names.append(tag.get('name', ''))
-                elif isinstance(tag, str):
-                    tag_names.append(tag)
-                # Skip if tag is an integer or other non-string/non-dict type
+        loc_link = location_links.get(entity.get('location_id'))
+        if loc_link:
+            loc_label, loc_anchor = loc_link
+            details.append((ui['location'], f"[{loc_label}](#{loc_anchor})"))
+        
+        ent_type = ent.get('type')
+        if ent_type:
+            details.append((ui['type'], md_escape(ent_type)))
+        
+        entity_tags = ent.get('tags')
+        if entity_tags:
+            # Tags are either {'name': ...} dicts or plain strings (JSON never
+            # yields subclasses, so exact type checks suffice); ids and other
+            # types are skipped
+            tag_names = [tag if type(tag) is str else tag['name'] for tag in entity_tags
+                         if type(tag) is str or (type(tag) is dict and 'name' in tag)]
             if tag_names:
-                details.append(f"- **{get_ui_text('tags', language)}:** {', '.join(tag_names)}")
+                details.append((ui['tags'], ', '.join(tag_names)))
         
-        if 'age' in entity and entity['age']:
-            details.append(f"- **{get_ui_text('age', language)}:** {entity['age']}")
+        age = entity.get('age')
+        if age:
+            details.append((ui['age'], age))
         
-        if 'gender' in entity and entity['gender']:
-            details.append(f"- **{get_ui_text('gender', language)}:** {entity['gender']}")
+        gender = entity.get('gender')
+        if gender:
+            details.append((ui['gender'], gender))
         
-        details_md = ""
-        if details:
-            details_block = '\n'.join(details)
-            if not details_block.startswith('\n- '):
-                details_block = '\n' + details_block
-            details_md = f"\n\n---\n**{get_ui_text('details', language)}:**\n" + details_block + "\n\n"
+        details_md = render_details(details) if details else ""
         
-        full_entry = details_md + entry_md
-        lines.append(f"{full_entry}")
+        buf.write(f"{details_md}{entry_md}\n")
         
         # Add family members if this is a family
         pivot_members = entity.get('pivotMembers', [])
         if pivot_members:
-            lines.append(f"**{get_ui_text('family_members', language)}:**\n")
-            for member in pivot_members:
-                char_id = member.get('character_id')
-                entity_id = character_id_to_entity_id.get(char_id)
-                char_info = entity_map.get(entity_id)
-                if char_info:
-                    char_name = char_info['name']
-                    char_anchor = create_anchor_label(char_name)
-                    lines.append(f"- [{md_escape(char_name)}](#{char_anchor})")
-                else:
-                    lines.append(f"- **Unknown member {char_id}**")
-            lines.append("")
+            buf.write(render_family_members(pivot_members))
         
         # Add posts as subentities if they exist and include_posts is True
-        posts = ent.get('posts', [])
-        if posts and include_posts:
-            # Sort posts by position if available, otherwise by creation date
-            sorted_posts = sorted(posts, key=lambda p: (p.get('position', 0), p.get('created_at', '')))
-            
-            for post in sorted_posts:
-                # Skip private posts if include_private is False
-                # visibility_id: 1 = Public, 2 = Private (Admin only), 3 = Private (Self only)
-                if not include_private and post.get('visibility_id', 1) != 1:
-                    continue
-                
-                post_name = post.get('name', get_ui_text('unnamed_post', language))
-                post_entry = post.get('entry', '')
-                
-                # Skip posts with empty or minimal content (like just <br>)
-                if not post_entry or post_entry.strip() in ['<br>', '<br/>', '<br />', '']:
-                    continue
-                
-                # Create anchor for the post
-                post_anchor = create_anchor_label(f"{name}_{post_name}")
-                post_pluses = '+' * (depth + 3)  # One level deeper than the parent entity
-                
-                # Add post as subentity with header level depth + 3 (h3 for depth 0, h4 for depth 1, etc.)
-                lines.append(f"### {md_escape(post_name)} (({post_pluses}{post_anchor}))")
-                lines.append("")
-                
-                # Process post content
-                post_entry_cleaned = convert_mentions_in_html(post_entry)
-                post_entry_md = replace_mentions(post_entry_cleaned, entity_map)
-                
-                lines.append(f"{post_entry_md}\n")
-                lines.append("---")
-                lines.append("")
-        
-        lines.append("---")
-        return lines
+        write_posts(ent, name, buf, depth)
+        
+        buf.write("---\n")
     
     # Write hierarchical section with tree traversal
-    def write_hierarchical_section(title, entities_list, entity_map, section_slug, max_depth=5):
+    def write_hierarchical_section(title, entities_list, entity_map, section_slug, buf, max_depth=5):
         if not entities_list:
-            return []
+            return
         
-        lines = []
-        lines.append(f"# {title} ((+{section_slug}))")
-        lines.append("")
+        buf.write(f"# {title} ((+{section_slug}))\n\n")
         
         # Build tree
         root_nodes = build_entity_tree(entities_list)
         
-        # Traverse tree and write entities
-        def traverse_and_write(node, depth=0):
+        # Traverse tree depth-first with an explicit stack (children are pre-sorted by name)
+        stack = [(root, 0) for root in reversed(root_nodes)]
+        while stack:
+            node, depth = stack.pop()
             if depth > max_depth:
-                return
+                continue
             
             # Write this node
-            entity_lines = write_hierarchical_entity(node.entity, depth, max_depth)
-            lines.extend(entity_lines)
+            write_hierarchical_entity(node.entity, buf, depth, max_depth)
             
-            # Sort children by name and recursively write them
-            sorted_children = sorted(node.children, key=lambda n: n.get_name())
-            for child in sorted_children:
-                traverse_and_write(child, depth + 1)
-        
-        # Sort root nodes by name and traverse
-        sorted_roots = sorted(root_nodes, key=lambda n: n.get_name())
-        for root in sorted_roots:
-            traverse_and_write(root)
-        
-        return lines
-
-    # Simple function that adds all lines without pagination
-    def add_section(section_lines, output_lines):
-        output_lines.extend(section_lines)
+            # Push children in reverse so they are popped in name order
+            stack.extend((child, depth + 1) for child in reversed(node.children))
 
-    # Helper to check privacy
-    def is_private_obj(obj):
-        ent = obj.get('entity', {})
-        return obj.get('is_private', 0) == 1 or ent.get('is_private', 0) == 1
 
     # Debug: print counts before privacy filtering
     # print(f"[DEBUG] Locations before privacy filter: {len(locations)}")
     # print(f"[DEBUG] Characters before privacy filter: {len(characters)}")
-    # print(f"[DEBUG] Charlocations before privacy filter: {len(charlocations)}")
     # print(f"[DEBUG] Organizations before privacy filter: {len(organizations)}")
     # print(f"[DEBUG] Events before privacy filter: {len(events)}")
     # print(f"[DEBUG] Items before privacy filter: {len(items)}")
@@ -387,22 +423,22 @@ def generate_worldbook(entities: dict, include_private=False, include_posts=True
     # print(f"[DEBUG] Races before privacy filter: {len(races)}")
 
     if not include_private:
-        locations = {k: v for k, v in locations.items() if not is_private_obj(v)}
-        characters = [c for c in characters if not is_private_obj(c)]
-        charlocations = {k: v for k, v in charlocations.items() if not is_private_obj(v)}
-        organizations = [o for o in organizations if not is_private_obj(o)]
-        events = [e for e in events if not is_private_obj(e)]
-        items = [i for i in items if not is_private_obj(i)]
-        families = [f for f in families if not is_private_obj(f)]
-        notes = [n for n in notes if not is_private_obj(n)]
-        races = [r for r in races if not is_private_obj(r)]
+        # filterfalse drives the loop in C; only the predicate runs per entity
+        organizations = list(filterfalse(is_private_obj, organizations))
+        events = list(filterfalse(is_private_obj, events))
+        items = list(filterfalse(is_private_obj, items))
+        families = list(filterfalse(is_private_obj, families))
+        notes = list(filterfalse(is_private_obj, notes))
+        races = list(filterfalse(is_private_obj, races))
+        # Locations and characters are filtered below, while indexing them. With
+        # these filtered, their writers (and the race/organization ones) only
+        # test for the private flag when include_private is set
 
     if journals is None:
         journals = []
 
     # print(f"[DEBUG] Locations after privacy filter: {len(locations)}")
     # print(f"[DEBUG] Characters after privacy filter: {len(characters)}")
-    # print(f"[DEBUG] Charlocations after privacy filter: {len(charlocations)}")
     # print(f"[DEBUG] Organizations after privacy filter: {len(organizations)}")
     # print(f"[DEBUG] Events after privacy filter: {len(events)}")
     # print(f"[DEBUG] Items after privacy filter: {len(items)}")
@@ -410,23 +446,17 @@ def generate_worldbook(entities: dict, include_private=False, include_posts=True
     # print(f"[DEBUG] Notes after privacy filter: {len(notes)}")
     # print(f"[DEBUG] Races after privacy filter: {len(races)}")
 
-    # Build location trees properly using location IDs (not entity IDs)
-    # Convert the locations dict to use location IDs as keys instead of entity IDs
-    location_by_id = {}
-    for loc in locations.values():
-        # Use the location's own ID, not the entity ID
-        location_by_id[loc['id']] = loc
-    
-    charlocations_by_id = {loc['id']: loc for loc in charlocations.values()}
-    
     # Build a complete location hierarchy using a tree structure
     # This approach can handle missing intermediate nodes and build the full hierarchy
     class LocationNode:
+        __slots__ = ('location', 'children', 'parent', 'depth', 'name')
+        
         def __init__(self, location_data):
             self.location = location_data
             self.children = []
             self.parent = None
             self.depth = 0
+            self.name = location_data.get('name') or (location_data.get('entity') or EMPTY_ENTITY).get('name', 'Unnamed Location')
         
         def add_child(self, child_node):
             child_node.parent = self
@@ -434,15 +464,38 @@ def generate_worldbook(entities: dict, include_private=False, include_posts=True
             self.children.append(child_node)
         
         def get_name(self):
-            return self.location.get('name') or self.location.get('entity', {}).get('name', 'Unnamed Location')
+            return self.name
         
         def get_id(self):
             return self.location['id']
     
-    # Create all location nodes
+    # Build location trees properly using location IDs (not entity IDs).
+    # Privacy filtering and every location index are done in a single pass.
+    # Location id -> entity id, used to group characters under their location
+    loc_id_to_entity_id = {}
     location_nodes = {}
+    # Location id -> (escaped name, anchor) for the location link in details blocks
+    location_links = {}
     for loc in locations.values():
-        location_nodes[loc['id']] = LocationNode(loc)
+        if not include_private and is_private_obj(loc):
+            continue
+        # Use the location's own ID, not the entity ID
+        loc_id = loc['id']
+        loc_ent = loc['entity']
+        loc_id_to_entity_id[loc_id] = loc_ent['id']
+        location_nodes[loc_id] = LocationNode(loc)
+        loc_name = loc.get('name') or loc_ent.get('name')
+        if loc_name:
+            location_links[loc_id] = (md_escape(loc_name), create_anchor_label(loc_name))
+    
+    # Resolve every character id to its (escaped name, anchor) once for the
+    # member lists of families and organizations
+    member_links = {}
+    for char_id, char_entity_id in character_id_to_entity_id.items():
+        char_info = entity_map.get(char_entity_id)
+        if char_info:
+            char_name = char_info['name']
+            member_links[char_id] = (md_escape(char_name), create_anchor_label(char_name))
     
     # Build parent-child relationships
     root_nodes = []
@@ -456,114 +509,80 @@ def generate_worldbook(entities: dict, include_private=False, include_posts=True
             # This is a root location (no parent or parent not in data)
             root_nodes.append(node)
     
-    # Debug: Check for Tomasberg specifically
-    tomasberg_found = False
-    for loc in locations.values():
-        if loc.get('name') == 'Tomasberg':
-            tomasberg_found = True
-            # print(f"[DEBUG] Found Tomasberg: id={loc['id']}, location_id={loc.get('location_id')}")
-            parent_loc_id = loc.get('location_id')
-            if parent_loc_id in location_by_id:
-                # print(f"[DEBUG] Tomasberg parent found: {location_by_id[parent_loc_id].get('name')}")
-                pass
-            else:
-                # print(f"[DEBUG] Tomasberg parent NOT found: {parent_loc_id}")
-                pass
-    if not tomasberg_found:
-        # print("[DEBUG] Tomasberg NOT found in locations!")
-        pass
-    # print(f"[DEBUG] Root locations: {[node.get_name() for node in root_nodes]}")
-    
-    # Debug: Print the complete tree structure
-    def print_tree_debug(node, indent=0):
-        # print("  " * indent + f"- {node.get_name()} (ID: {node.get_id()}, Depth: {node.depth})")
-        for child in sorted(node.children, key=lambda x: x.get_name()):
-            print_tree_debug(child, indent + 1)
-    # print("[DEBUG] Complete location tree structure:")
-    # for root in sorted(root_nodes, key=lambda x: x.get_name()):
-    #     print_tree_debug(root)
-    
-    # Convert tree structure back to the format expected by the rest of the code
-    loc_children = defaultdict(list)
-    root_locations = []
-    
-    def process_node(node):
-        # Add this node's children to the loc_children dict
-        for child in node.children:
-            loc_children[node.get_id()].append(child.location)
-            process_node(child)
-    
-    for root_node in root_nodes:
-        root_locations.append(root_node.location)
-        process_node(root_node)
-    
+    # Sort the location tree by name once, before it is rendered. The key is the
+    # raw name ('' when missing) so nameless locations sort first, not as
+    # 'Unnamed Location'
+    def location_sort_key(node):
+        return entity_sort_name(node.location)
+    for node in location_nodes.values():
+        node.children.sort(key=location_sort_key)
+    root_nodes.sort(key=location_sort_key)
+    
+    # Characters are sorted by name once up front; grouping preserves that order,
+    # so neither the chapter nor the per-location lists need sorting again
     chars_by_location = defaultdict(list)
-    chars_without_location = characters
-    for char in characters:
-        loc_id = char.get('location_id')
-        if loc_id and loc_id in location_by_id:
-            parent_entity_id = location_by_id[loc_id]['entity']['id']
+    chars_without_location = []
+    for char in sorted(characters, key=entity_sort_name):
+        if not include_private and is_private_obj(char):
+            continue
+        chars_without_location.append(char)
+        parent_entity_id = loc_id_to_entity_id.get(char.get('location_id'))
+        if parent_entity_id is not None:
             chars_by_location[parent_entity_id].append(char)
     
 
-    def write_location(loc, depth=0, max_depth=10):
-        if depth > max_depth:
-            return []
-        
-        ent = loc['entity']
-        loc_name = loc.get('name') or ent.get('name', 'Unnamed Location')
-        anchor = create_anchor_label(loc_name)
-        
-        # Calculate proper header level: h2 for root locations, h3 for children, etc.
-        header_level = depth + 2
-        header_markers = '#' * header_level
-        
-        # Calculate pluses for anchor (depth + 2 to match other entities)
-        pluses = '+' * (depth + 2)
-        
-        lines = []
-        
-        # Add extra newlines before deeper headers for better readability
-        extra_newlines = '\n\n' if depth >= 4 else ''
-        lines.append(f'\n{extra_newlines}{header_markers} {md_escape(loc_name)} (({pluses}{anchor}))\n\n')
-        
-        # Add location image if available
-        gallery_dir = os.path.join(os.path.dirname(__file__), 'kanka_jsons', 'gallery')
-        if os.path.exists(gallery_dir):
-            image_markdown = get_entity_image_markdown(loc, gallery_dir, loc_name)
-            if image_markdown:
-                lines.append(image_markdown)
-        
-        entry_html = loc.get('entry') or ent.get('entry') or ''
-        entry_cleaned = convert_mentions_in_html(entry_html)
-        entry_md = replace_mentions(entry_cleaned, entity_map)
-        details = []
-        if is_private_obj(loc):
-            details.append(f"- **{get_ui_text('private', language)}:** {get_ui_text('yes', language)}")
-        if details:
-            # Ensure a blank line before the list
-            details_block = '\n'.join(details)
-            if not details_block.startswith('\n- '):
-                details_block = '\n' + details_block
-            lines.append(f"\n---\n**{get_ui_text('details', language)}:**\n\n" + details_block + "\n\n")
-        if entry_md.strip():
-            lines.append(f"{entry_md}\n\n")
-        chars_here = chars_by_location.get(ent['id'], [])
-        if chars_here:
-            lines.append(f"**{get_ui_text('characters_at_location', language)}: {md_escape(loc_name)}:**\n\n")
-            for c in sorted(chars_here, key=lambda x: x.get('name') or x['entity'].get('name', '')):
-                ent = c.get('entity', {})
-                c_name = c.get('name') or c['entity'].get('name', 'Unnamed Character')
-                c_anchor = create_anchor_label(c_name)
-                lines.append(f"- [{md_escape(c_name)}](#{c_anchor})\n")
-            lines.append('\n')
-        
-        # Recursively write child locations with proper depth management
-        for child_loc in sorted(loc_children.get(loc['id'], []), key=lambda x: x.get('name') or x['entity'].get('name', '')):
-            child_lines = write_location(child_loc, depth + 1, max_depth)
-            lines.extend(child_lines)
-        
-        return lines
+    # Writes a location node and its children (depth-first) to `buf`
+    def write_location(root_node, buf, max_depth=10):
+        stack = [(root_node, 0)]
+        while stack:
+            node, depth = stack.pop()
+            if depth > max_depth:
+                continue
+            
+            loc = node.location
+            ent = loc['entity']
+            loc_name = node.name
+            anchor = create_anchor_label(loc_name)
+            
+            # Calculate proper header level: h2 for root locations, h3 for children, etc.
+            header_level = depth + 2
+            header_markers = '#' * header_level
+            
+            # Calculate pluses for anchor (depth + 2 to match other entities)
+            pluses = '+' * (depth + 2)
+            
+            # Add extra newlines before deeper headers for better readability
+            extra_newlines = '\n\n' if depth >= 4 else ''
+            buf.write(f'\n{extra_newlines}{header_markers} {md_escape(loc_name)} (({pluses}{anchor}))\n\n\n')
+            
+            # Add location image if available
+            if gallery is not None:
+                image_markdown = get_entity_image_markdown(loc, gallery, loc_name)
+                if image_markdown:
+                    buf.write(f"{image_markdown}\n")
+            
+            entry_html = loc.get('entry') or ent.get('entry') or ''
+            entry_md = render_entry(entry_html) if entry_html else ''
+            details = []
+            if include_private and (loc.get('is_private', 0) == 1 or ent.get('is_private', 0) == 1):
+                details.append(private_detail)
+            if details:
+                # Locations have always left an extra blank line above the list
+                buf.write(render_details(details, lead='\n', gap='\n\n\n'))
+                buf.write('\n')
+            if entry_md.strip():
+                buf.write(f"{entry_md}\n\n\n")
+            chars_here = chars_by_location.get(ent['id'], [])
+            if chars_here:
+                buf.write(f"**{ui['characters_at_location']}: {md_escape(loc_name)}:**\n\n\n")
+                for c in chars_here:
+                    c_name = c.get('name') or (c.get('entity') or EMPTY_ENTITY).get('name', 'Unnamed Character')
+                    c_anchor = create_anchor_label(c_name)
+                    buf.write(f"- [{md_escape(c_name)}](#{c_anchor})\n\n")
+                buf.write('\n\n')
+            
+            # Push child locations in reverse so they are written in name order
+            stack.extend((child, depth + 1) for child in reversed(node.children))
     # --- Races and Subraces ---
     race_children = defaultdict(list)
     root_races = []
@@ -573,425 +592,243 @@ def generate_worldbook(entities: dict, include_private=False, include_posts=True
             race_children[parent_id].append(race)
         else:
             root_races.append(race)
-    def write_race(race, depth=0, max_depth=10):
-        if depth > max_depth:
-            return []
-        
-        ent = race.get('entity', {})
-        race_name = race.get('name') or ent.get('name', 'Unnamed Race')
-        anchor = create_anchor_label(race_name)
-        
-        # Calculate proper header level: h2 for root races, h3 for children, etc.
-        header_level = depth + 2
-        header_markers = '#' * header_level
-        
-        # Calculate pluses for anchor (depth + 2 to match other entities)
-        pluses = '+' * (depth + 2)
-        
-        lines = []
-        
-        # Add extra newlines before deeper headers for better readability
-        extra_newlines = '\n\n' if depth >= 4 else ''
-        lines.append(f'\n{extra_newlines}{header_markers} {md_escape(race_name)} (({pluses}{anchor}))\n\n')
-        
-        # Add race image if available
-        gallery_dir = os.path.join(os.path.dirname(__file__), 'kanka_jsons', 'gallery')
-        if os.path.exists(gallery_dir):
-            image_markdown = get_entity_image_markdown(race, gallery_dir, race_name)
-            if image_markdown:
-                lines.append(image_markdown)
-        
-        entry_html = race.get('entry') or ent.get('entry') or ''
-        entry_cleaned = convert_mentions_in_html(entry_html)
-        entry_md = replace_mentions(entry_cleaned, entity_map)
-        details = []
-        if is_private_obj(race):
-            details.append(f"- **{get_ui_text('private', language)}:** {get_ui_text('yes', language)}")
-        if details:
-            # Ensure a blank line before the list
-            details_block = '\n'.join(details)
-            if not details_block.startswith('\n- '):
-                details_block = '\n' + details_block
-            lines.append(f"\n---\n**{get_ui_text('details', language)}:**\n" + details_block + "\n\n")
-        if entry_md.strip():
-            lines.append(f"{entry_md}\n\n")
-        
-        # Recursively write child races with proper depth management
-        for child_race in sorted(race_children.get(race['id'], []), key=lambda x: x.get('name') or x.get('entity', {}).get('name', '')):
-            child_lines = write_race(child_race, depth + 1, max_depth)
-            lines.extend(child_lines)
-        
-        return lines
-    def generate_organizations(organizations, entity_map, character_id_to_entity_id, language='en'):
-        markdown = f"\n# {get_chapter_title('organizations', language)}  ((+{get_chapter_slug('organizations', language)}))\n\n"
-        for org in sorted(organizations, key=lambda o: o.get('name') or o.get('entity', {}).get('name', '')):
-            ent = org.get('entity', {})
+    for children in race_children.values():
+        children.sort(key=entity_sort_name)
+    root_races.sort(key=entity_sort_name)
+    # Writes a race and its subraces (depth-first) to `buf`
+    def write_race(root_race, buf, max_depth=10):
+        stack = [(root_race, 0)]
+        while stack:
+            race, depth = stack.pop()
+            if depth > max_depth:
+                continue
+            
+            ent = race.get('entity') or EMPTY_ENTITY
+            race_name = race.get('name') or ent.get('name', 'Unnamed Race')
+            anchor = create_anchor_label(race_name)
+            
+            # Calculate proper header level: h2 for root races, h3 for children, etc.
+            header_level = depth + 2
+            header_markers = '#' * header_level
+            
+            # Calculate pluses for anchor (depth + 2 to match other entities)
+            pluses = '+' * (depth + 2)
+            
+            # Add extra newlines before deeper headers for better readability
+            extra_newlines = '\n\n' if depth >= 4 else ''
+            buf.write(f'\n{extra_newlines}{header_markers} {md_escape(race_name)} (({pluses}{anchor}))\n\n\n')
+            
+            # Add race image if available
+            if gallery is not None:
+                image_markdown = get_entity_image_markdown(race, gallery, race_name)
+                if image_markdown:
+                    buf.write(f"{image_markdown}\n")
+            
+            entry_html = race.get('entry') or ent.get('entry') or ''
+            entry_md = render_entry(entry_html) if entry_html else ''
+            details = []
+            if include_private and (race.get('is_private', 0) == 1 or ent.get('is_private', 0) == 1):
+                details.append(private_detail)
+            if details:
+                buf.write(render_details(details, lead='\n'))
+                buf.write('\n')
+            if entry_md.strip():
+                buf.write(f"{entry_md}\n\n\n")
+            
+            # Push subraces in reverse so they are written in name order
+            stack.extend((child, depth + 1) for child in reversed(race_children.get(race['id'], [])))
+    # Writes the organizations chapter to `buf`
+    def write_organizations(organizations, buf):
+        buf.write(f"\n# {titles['organizations']}  ((+{slugs['organizations']}))\n\n")
+        for org in sorted(organizations, key=entity_sort_name):
+            ent = org.get('entity') or EMPTY_ENTITY
             org_name = org.get('name') or ent.get('name', 'Unnamed Organization')
             anchor = create_anchor_label(org_name)
-            pluses = '++'
-            markdown += f"## {md_escape(org_name)} (({pluses}{anchor}))\n\n"
+            buf.write(f"## {md_escape(org_name)} ((++{anchor}))\n\n")
             
             # Add organization image if available
-            gallery_dir = os.path.join(os.path.dirname(__file__), 'kanka_jsons', 'gallery')
-            if os.path.exists(gallery_dir):
-                image_markdown = get_entity_image_markdown(org, gallery_dir, org_name)
+            if gallery is not None:
+                image_markdown = get_entity_image_markdown(org, gallery, org_name)
                 if image_markdown:
-                    markdown += image_markdown
+                    buf.write(image_markdown)
             
             entry = ent.get('entry')
             details = []
-            if is_private_obj(org):
-                details.append(f"- **{get_ui_text('private', language)}:** {get_ui_text('yes', language)}")
+            if include_private and (org.get('is_private', 0) == 1 or ent.get('is_private', 0) == 1):
+                details.append(private_detail)
             if details:
-                # Ensure a blank line before the list
-                details_block = '\n'.join(details)
-                if not details_block.startswith('\n- '):
-                    details_block = '\n' + details_block
-                markdown += f"\n---\n**{get_ui_text('details', language)}:**\n" + details_block + "\n\n"
+                buf.write(render_details(details, lead='\n'))
             if entry:
-                entry_md = replace_mentions(entry, entity_map)
-                markdown += f"{entry_md}\n\n"
+                entry_md = replace_mentions(entry)
+                buf.write(f"{entry_md}\n\n")
             members = org.get('members', [])
             if members:
-                markdown += f"**{get_ui_text('members', language)}:**\n\n"
+                buf.write(f"**{ui['members']}:**\n\n")
                 for member in members:
                     char_id = member.get('character_id')
-                    entity_id = character_id_to_entity_id.get(char_id)
-                    char_info = entity_map.get(entity_id)
-                    if char_info:
-                        char_name = char_info['name']
-                        char_anchor = create_anchor_label(char_name)
+                    member_link = member_links.get(char_id)
+                    if member_link:
+                        char_label, char_anchor = member_link
                         role = member.get('role')
                         if role:
-                            markdown += f"- [{md_escape(char_name)}](#{char_anchor}) ({md_escape(role)})\n"
+                            buf.write(f"- [{char_label}](#{char_anchor}) ({md_escape(role)})\n")
                         else:
-                            markdown += f"- [{md_escape(char_name)}](#{char_anchor})\n"
-                    else:
-                        markdown += f"- **{get_ui_text('unknown_member', language)} {char_id}**\n"
-                markdown += "\n"
-        return markdown
-    def write_section(title, entries, entity_map, section_slug):
-        markdown = f"\n# {title} ((+{section_slug}))\n\n"
-        for e in sorted(entries, key=lambda e: e.get('name') or e.get('entity', {}).get('name', '')):
-            ent = e.get('entity', {})
-            name = e.get('name') or ent.get('name', f'Unnamed {title}')
-            anchor = create_anchor_label(name)
-            pluses = '++'
-            markdown += f"## {md_escape(name)} (({pluses}{anchor}))\n\n"
-            
-            # Add entity image if available
-            gallery_dir = os.path.join(os.path.dirname(__file__), 'kanka_jsons', 'gallery')
-            if os.path.exists(gallery_dir):
-                image_markdown = get_entity_image_markdown(e, gallery_dir, name)
-                if image_markdown:
-                    markdown += image_markdown
-            
-            entry_html = e.get('entry') or e.get('entity', {}).get('entry') or ''
-            entry_cleaned = convert_mentions_in_html(entry_html)
-            entry_md = replace_mentions(entry_cleaned, entity_map)
-            details = []
-            if is_private_obj(e):
-                details.append(f"- **{get_ui_text('private', language)}:** {get_ui_text('yes', language)}")
-            # Add location as a markdown link if available
-            loc_name = None
-            if e.get('location_id') and e.get('location_id') in location_by_id:
-                loc = location_by_id[e['location_id']]
-                loc_name = loc.get('name') or loc.get('entity', {}).get('name')
-            if loc_name:
-                loc_anchor = create_anchor_label(loc_name)
-                details.append(f"- **{get_ui_text('location', language)}:** [{md_escape(loc_name)}](#{loc_anchor})")
-            if 'type' in ent and ent['type']:
-                details.append(f"- **{get_ui_text('type', language)}:** {md_escape(ent['type'])}")
-            if ent.get('tags'):
-                tag_names = [tag.get('name', '') for tag in ent.get('tags', [])]
-                details.append(f"- **{get_ui_text('tags', language)}:** {', '.join(tag_names)}")
-            if 'age' in e and e['age']:
-                details.append(f"- **{get_ui_text('age', language)}:** {e['age']}")
-            if 'gender' in e and  e['gender']:
-                details.append(f"- **{get_ui_text('gender', language)}:** {e['gender']}")
-            details_md = ""
-            if details:
-                # Ensure a blank line before the list
-                details_block = '\n'.join(details)
-                if not details_block.startswith('\n- '):
-                    details_block = '\n' + details_block
-                details_md = f"\n\n---\n**{get_ui_text('details', language)}:**\n" + details_block + "\n\n"
-            full_entry = details_md + entry_md
-            markdown += f"{full_entry}\n"
-            pivot_members = e.get('pivotMembers', [])
-            if pivot_members:
-                markdown += f"**{get_ui_text('family_members', language)}:**\n\n"
-                for member in pivot_members:
-                    char_id = member.get('character_id')
-                    entity_id = character_id_to_entity_id.get(char_id)
-                    char_info = entity_map.get(entity_id)
-                    if char_info:
-                        char_name = char_info['name']
-                        char_anchor = create_anchor_label(char_name)
-                        markdown += f"- [{md_escape(char_name)}](#{char_anchor})\n"
+                            buf.write(f"- [{char_label}](#{char_anchor})\n")
                     else:
-                        markdown += f"- **Unknown member {char_id}**\n"
-                markdown += "\n"
-            markdown += "\n---\n"
-        return markdown
+                        buf.write(f"- **{ui['unknown_member']} {char_id}**\n")
+                buf.write("\n")
+        # Newline-terminate the chapter like every other writer
+        buf.write('\n')
 
-    # Render sections in order with hierarchy support
-    output_lines = []
+    # Markdown for the first race/family a character belongs to: a link when
+    # the target has an id (and so a heading of its own), else just the name
+    def first_membership(memberships, key):
+        if not memberships:
+            return None
+        target = memberships[0].get(key)
+        if not target or not target.get('name'):
+            return None
+        target_name = target['name']
+        if target.get('id'):
+            return f"[{md_escape(target_name)}](#{create_anchor_label(target_name)})"
+        return md_escape(target_name)
+    
+    # Writes one character of the characters chapter, with its posts, to `buf`
+    def write_character(c, buf):
+        c_ent = c.get('entity') or EMPTY_ENTITY
+        c_name = c.get('name') or c_ent.get('name', 'Unnamed Character')
+        anchor = create_anchor_label(c_name)
+        entry_html = c.get('entry') or ""
+        entry = render_entry(entry_html) if entry_html else ''
+        details = []
+        if include_private and (c.get('is_private', 0) == 1 or c_ent.get('is_private', 0) == 1):
+            details.append(private_detail)
+        # Exports use either snake_case or camelCase for these lists
+        race_md = first_membership(c.get('character_races') or c.get('characterRaces'), 'race')
+        if race_md:
+            details.append((ui['race'], race_md))
+        loc_link = location_links.get(c.get('location_id'))
+        if loc_link:
+            loc_label, loc_anchor = loc_link
+            details.append((ui['location'], f"[{loc_label}](#{loc_anchor})"))
+        family_md = first_membership(c.get('character_families') or c.get('characterFamilies'), 'family')
+        if family_md:
+            details.append((ui['family'], family_md))
+        if c.get('age'):
+            details.append((ui['age'], md_escape(str(c['age']))))
+        if c.get('sex'):
+            details.append((ui['gender'], md_escape(str(c['sex']))))
+        elif c.get('gender'):
+            details.append((ui['gender'], md_escape(str(c['gender']))))
+        is_dead = c.get('is_dead') or c_ent.get('is_dead')
+        if is_dead:
+            details.append((ui['dead'], ui['yes']))
+        details_md = render_details(details) if details else ""
+        
+        # Add character image if available
+        image_md = ''
+        if gallery is not None:
+            image_markdown = get_entity_image_markdown(c, gallery, c_name)
+            if image_markdown:
+                image_md = f"{image_markdown}\n"
+        
+        # Heading, image and body go out as a single chunk per character
+        buf.write(f"## {md_escape(c_name)} ((++{anchor}))\n\n\n{image_md}{details_md}{entry}\n\n")
+        
+        # Add posts as subentities if they exist for characters and include_posts is True
+        write_posts(c_ent, c_name, buf, gap='\n\n\n')
+        
+        buf.write("---\n\n")
     
+    # Render sections in order with hierarchy support
     # Campaign Overview (first chapter)
     if campaign:
-        campaign_section = []
         campaign_name = campaign.get('name', 'Campaign Overview')
-        campaign_section.append(f"# {md_escape(campaign_name)} ((+campaign-overview))")
-        campaign_section.append('')
+        out.write(f"# {md_escape(campaign_name)} ((+campaign-overview))\n\n")
         
         # Add campaign image if available
-        gallery_dir = os.path.join(os.path.dirname(__file__), 'kanka_jsons', 'gallery')
-        if os.path.exists(gallery_dir):
-            image_markdown = get_entity_image_markdown(campaign, gallery_dir, campaign_name)
+        if gallery is not None:
+            image_markdown = get_entity_image_markdown(campaign, gallery, campaign_name)
             if image_markdown:
-                campaign_section.append(image_markdown)
+                out.write(f"{image_markdown}\n")
         
         # Process campaign entry/description
         entry_html = campaign.get('entry', '')
         if entry_html:
-            entry_cleaned = convert_mentions_in_html(entry_html)
-            entry_md = replace_mentions(entry_cleaned, entity_map)
-            campaign_section.append(f"{entry_md}\n")
+            out.write(f"{render_entry(entry_html)}\n\n")
         
         # Add campaign details (only excerpt, no timestamps)
         details = []
         if campaign.get('excerpt'):
-            details.append(f"- **{get_ui_text('excerpt', language)}:** {md_escape(campaign['excerpt'])}")
+            details.append((ui['excerpt'], md_escape(campaign['excerpt'])))
         
         if details:
-            details_block = '\n'.join(details)
-            campaign_section.append(f"\n---\n**{get_ui_text('details', language)}:**\n")
-            campaign_section.append(details_block)
-            campaign_section.append("\n")
+            out.write(render_details(details, lead='\n'))
+            out.write('\n')
         
-        campaign_section.append("---")
-        add_section(campaign_section, output_lines)
+        out.write("---\n")
     
     # Locations (keep existing hierarchical logic)
-    loc_section = []
-    loc_section.append(f"# {get_chapter_title('locations', language)} ((+{get_chapter_slug('locations', language)}))")
-    loc_section.append('')
-    for root_loc in sorted(root_locations, key=lambda x: x.get('name') or x['entity'].get('name', '')):
-        loc_section.extend(write_location(root_loc))
-    if loc_section:
-        add_section(loc_section, output_lines)
+    out.write(f"# {titles['locations']} ((+{slugs['locations']}))\n\n")
+    for root_node in root_nodes:
+        write_location(root_node, out)
     
     # Characters without location (keep existing logic)
-    chars_section = []
     if chars_without_location:
-        chars_section.append(f"# {get_chapter_title('characters', language)}  ((+{get_chapter_slug('characters', language)}))")
-        chars_section.append('')
-        for c in sorted(chars_without_location, key=lambda x: x.get('name') or x.get('entity', {} ).get('name', '')):
-            c_ent = c['entity']
-            c_name = c.get('name') or c_ent.get('name', 'Unnamed Character')
-            anchor = create_anchor_label(c_name)
-            entry_html = c.get('entry') or ""
-            entry_cleaned = convert_mentions_in_html(entry_html)
-            entry = replace_mentions(entry_cleaned, entity_map)
-            details = []
-            if is_private_obj(c):
-                details.append(f"- **{get_ui_text('private', language)}:** {get_ui_text('yes', language)}")
-            race_name = None
-            race_id = None
-            if 'character_races' in c and c['character_races']:
-                race = c['character_races'][0].get('race')
-                if race:
-                    race_name = race.get('name')
-                    race_id = race.get('id')
-            elif 'characterRaces' in c and c['characterRaces']:
-                race = c['characterRaces'][0].get('race')
-                if race:
-                    race_name = race.get('name')
-                    race_id = race.get('id')
-            if race_name:
-                if race_id:
-                    race_anchor = create_anchor_label(race_name)
-                    details.append(f"- **{get_ui_text('race', language)}:** [{md_escape(race_name)}](#{race_anchor})")
-                else:
-                    details.append(f"- **{get_ui_text('race', language)}:** {md_escape(race_name)}")
-            loc_name = None
-            if c.get('location_id') and c.get('location_id') in location_by_id:
-                loc = location_by_id[c['location_id']]
-                loc_name = loc.get('name') or loc.get('entity', {}).get('name')
-            if loc_name:
-                loc_anchor = create_anchor_label(loc_name)
-                details.append(f"- **{get_ui_text('location', language)}:** [{md_escape(loc_name)}](#{loc_anchor})")
-            family_name = None
-            family_id = None
-            if 'character_families' in c and c['character_families']:
-                family = c['character_families'][0].get('family')
-                if family:
-                    family_name = family.get('name')
-                    family_id = family.get('id')
-            elif 'characterFamilies' in c and c['characterFamilies']:
-                family = c['characterFamilies'][0].get('family')
-                if family:
-                    family_name = family.get('name')
-                    family_id = family.get('id')
-            if family_name:
-                if family_id:
-                    family_anchor = create_anchor_label(family_name)
-                    details.append(f"- **{get_ui_text('family', language)}:** [{md_escape(family_name)}](#{family_anchor})")
-                else:
-                    details.append(f"- **{get_ui_text('family', language)}:** {md_escape(family_name)}")
-            if c.get('age'):
-                details.append(f"- **{get_ui_text('age', language)}:** {md_escape(str(c['age']))}")
-            if c.get('sex'):
-                details.append(f"- **{get_ui_text('gender', language)}:** {md_escape(str(c['sex']))}")
-            elif c.get('gender'):
-                details.append(f"- **{get_ui_text('gender', language)}:** {md_escape(str(c['gender']))}")
-            is_dead = c.get('is_dead') or c_ent.get('is_dead')
-            if is_dead:
-                details.append(f"- **{get_ui_text('dead', language)}:** {get_ui_text('yes', language)}")
-            details_md = ""
-            if details:
-                # Ensure a blank line before the list
-                details_block = '\n'.join(details)
-                if not details_block.startswith('\n- '):
-                    details_block = '\n' + details_block
-                details_md = f"\n\n---\n**{get_ui_text('details', language)}:**\n" + details_block + "\n\n"
-            chars_section.append(f"## {md_escape(c_name)} ((++{anchor}))\n\n")
-            
-            # Add character image if available
-            gallery_dir = os.path.join(os.path.dirname(__file__), 'kanka_jsons', 'gallery')
-            if os.path.exists(gallery_dir):
-                image_markdown = get_entity_image_markdown(c, gallery_dir, c_name)
-                if image_markdown:
-                    chars_section.append(image_markdown)
-            
-            chars_section.append(f"{details_md}{entry}\n")
-            
-            # Add posts as subentities if they exist for characters and include_posts is True
-            c_ent = c.get('entity', {})
-            posts = c_ent.get('posts', [])
-            if posts and include_posts:
-                # Sort posts by position if available, otherwise by creation date
-                sorted_posts = sorted(posts, key=lambda p: (p.get('position', 0), p.get('created_at', '')))
-                
-                for post in sorted_posts:
-                    # Skip private posts if include_private is False
-                    # visibility_id: 1 = Public, 2 = Private (Admin only), 3 = Private (Self only)
-                    if not include_private and post.get('visibility_id', 1) != 1:
-                        continue
-                    
-                    post_name = post.get('name', get_ui_text('unnamed_post', language))
-                    post_entry = post.get('entry', '')
-                    
-                    # Skip posts with empty or minimal content (like just <br>)
-                    if not post_entry or post_entry.strip() in ['<br>', '<br/>', '<br />', '']:
-                        continue
-                    
-                    # Create anchor for the post
-                    post_anchor = create_anchor_label(f"{c_name}_{post_name}")
-                    post_pluses = '+++'  # One level deeper than the character (++ -> +++)
-                    
-                    # Add post as subentity with header level h3 (one level deeper than character's h2)
-                    chars_section.append(f"### {md_escape(post_name)} (({post_pluses}{post_anchor}))\n\n")
-                    
-                    # Process post content
-                    post_entry_cleaned = convert_mentions_in_html(post_entry)
-                    post_entry_md = replace_mentions(post_entry_cleaned, entity_map)
-                    
-
-                    
-                    chars_section.append(f"{post_entry_md}\n")
-                    chars_section.append("---")
-                    chars_section.append("")
-            
-            chars_section.append("---\n")
-    if chars_section:
-        # For characters section, we want all characters to be included
-        # The add_section function does pagination which might filter out some characters
-        # So we'll add the characters section directly to ensure all characters are included
-        output_lines.extend(chars_section)
+        out.write(f"# {titles['characters']}  ((+{slugs['characters']}))\n\n")
+        for c in chars_without_location:
+            write_character(c, out)
     
     # Events (use hierarchical rendering)
     if events:
-        events_section = write_hierarchical_section(get_chapter_title('events', language), events, entity_map, get_chapter_slug('events', language))
-        if events_section:
-            add_section(events_section, output_lines)
+        write_hierarchical_section(titles['events'], events, entity_map, slugs['events'], out)
     
     # Organizations (keep existing logic for now)
-    orgs_section = generate_organizations(organizations, entity_map, character_id_to_entity_id, language).split('\n')
-    if orgs_section:
-        add_section(orgs_section, output_lines)
+    write_organizations(organizations, out)
     
     # Notes (use hierarchical rendering)
     if notes:
-        notes_section = write_hierarchical_section(get_chapter_title('notes', language), notes, entity_map, get_chapter_slug('notes', language))
-        if notes_section:
-            add_section(notes_section, output_lines)
+        write_hierarchical_section(titles['notes'], notes, entity_map, slugs['notes'], out)
     
     # Items (use hierarchical rendering)
     if items:
-        items_section = write_hierarchical_section(get_chapter_title('items', language), items, entity_map, get_chapter_slug('items', language))
-        if items_section:
-            add_section(items_section, output_lines)
+        write_hierarchical_section(titles['items'], items, entity_map, slugs['items'], out)
     
     # Families (use hierarchical rendering)
     if families:
-        families_section = write_hierarchical_section(get_chapter_title('families', language), families, entity_map, get_chapter_slug('families', language))
-        if families_section:
-            add_section(families_section, output_lines)
+        write_hierarchical_section(titles['families'], families, entity_map, slugs['families'], out)
     
     # Races (keep existing hierarchical logic)
-    races_section = []
-    races_section.append(f"# {get_chapter_title('races', language)} ((+{get_chapter_slug('races', language)}))")
-    races_section.append('')
-    for root_race in sorted(root_races, key=lambda x: x.get('name') or x.get('entity', {}).get('name', '')):
-        races_section.extend(write_race(root_race))
-    if races_section:
-        add_section(races_section, output_lines)
+    out.write(f"# {titles['races']} ((+{slugs['races']}))\n\n")
+    for root_race in root_races:
+        write_race(root_race, out)
     
     # Journals (use hierarchical rendering)
     if journals:
-        journals_section = write_hierarchical_section(get_chapter_title('journals', language), journals, entity_map, get_chapter_slug('journals', language))
-        if journals_section:
-            add_section(journals_section, output_lines)
+        write_hierarchical_section(titles['journals'], journals, entity_map, slugs['journals'], out)
     
     # Quests (use hierarchical rendering)
     if quests:
-        quests_section = write_hierarchical_section(get_chapter_title('quests', language), quests, entity_map, get_chapter_slug('quests', language))
-        if quests_section:
-            add_section(quests_section, output_lines)
+        write_hierarchical_section(titles['quests'], quests, entity_map, slugs['quests'], out)
     
     # Tags (use hierarchical rendering)
     if tags:
-        tags_section = write_hierarchical_section(get_chapter_title('tags', language), tags, entity_map, get_chapter_slug('tags', language))
-        if tags_section:
-            add_section(tags_section, output_lines)
+        write_hierarchical_section(titles['tags'], tags, entity_map, slugs['tags'], out)
     
     # Maps (use hierarchical rendering)
     if maps:
-        maps_section = write_hierarchical_section(get_chapter_title('maps', language), maps, entity_map, get_chapter_slug('maps', language))
-        if maps_section:
-            add_section(maps_section, output_lines)
+        write_hierarchical_section(titles['maps'], maps, entity_map, slugs['maps'], out)
     
     # Calendars (use hierarchical rendering)
     if calendars:
-        calendars_section = write_hierarchical_section(get_chapter_title('calendars', language), calendars, entity_map, get_chapter_slug('calendars', language))
-        if calendars_section:
-            add_section(calendars_section, output_lines)
+        write_hierarchical_section(titles['calendars'], calendars, entity_map, slugs['calendars'], out)
     
     # Timelines (use hierarchical rendering)
     if timelines:
-        timelines_section = write_hierarchical_section(get_chapter_title('timelines', language), timelines, entity_map, get_chapter_slug('timelines', language))
-        if timelines_section:
-            add_section(timelines_section, output_lines)
+        write_hierarchical_section(titles['timelines'], timelines, entity_map, slugs['timelines'], out)
     
     # Remove the generic section rendering that causes duplication
     # The sections above handle all known entity types
     
-    output_lines.append('---')
-    output_lines.append(f"## {get_ui_text('generation_settings', language)}\n")
-    output_lines.append(f"- **{get_ui_text('private_entities_display', language)}:** {get_ui_text('yes' if include_private else 'no', language)}\n")
-    if not output_lines:
-        return ''
-    result = '\n'.join(output_lines)
-    return result 
\ No newline at end of file
+    out.write(f"---\n## {ui['generation_settings']}\n\n")
+    out.write(f"- **{ui['private_entities_display']}:** {ui['yes' if include_private else 'no']}\n") 
\ No newline at end of file
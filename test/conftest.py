@@ -0,0 +1,18 @@
+"""
+conftest.py
+-----------
+Shared pytest setup for the unit tests.
+
+Puts the repository root (for the kanka_to_md package, whose modules use relative
+imports) and kanka_to_md itself (for importing standalone modules such as
+entity_processing directly) on sys.path once, before any test module is collected.
+"""
+
+import sys
+import os
+
+_HERE = os.path.dirname(__file__)
+for _path in (os.path.join(_HERE, '..'), os.path.join(_HERE, '../kanka_to_md')):
+    _path = os.path.abspath(_path)
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
@@ -6,6 +6,19 @@ This will help you set up and test the ConvertAPI integration.
 
 import os
 import sys
+import hashlib
+import shutil
+from pathlib import Path
+
+# Opt-in PDF cache (set CONVERTAPI_CACHE=1). Off by default: a cache hit skips
+# ConvertAPI entirely, so it would no longer check the key or connectivity.
+CACHE_ENABLED = os.environ.get('CONVERTAPI_CACHE') == '1'
+CACHE_DIR = Path(__file__).parent / ".convertapi_cache"
+
+
+def _pdf_cache_path(html_bytes):
+    """Content-addressed cache location for the PDF rendered from html_bytes."""
+    return CACHE_DIR / (hashlib.blake2b(html_bytes, digest_size=16).hexdigest() + ".pdf")
 
 def test_convertapi():
     """Test ConvertAPI functionality."""
@@ -57,6 +70,14 @@ def test_convertapi():
     </html>
     """
     
+    test_pdf = "test_convertapi.pdf"
+    cache = _pdf_cache_path(test_html.encode("utf-8")) if CACHE_ENABLED else None
+    if cache is not None and cache.exists():
+        shutil.copyfile(cache, test_pdf)
+        print(f"✅ Test PDF restored from cache: {test_pdf}")
+        print("⚠️  ConvertAPI was not contacted; unset CONVERTAPI_CACHE to check the key and connection")
+        return True
+    
     try:
         # Set the API key
         convertapi.api_secret = api_key
@@ -67,9 +88,11 @@ def test_convertapi():
             'File': test_html
         }, from_format='html')
         
-        # Save test PDF
-        test_pdf = "test_convertapi.pdf"
+        # Save test PDF (and, with the cache enabled, a copy for re-runs)
         result.file.save(test_pdf)
+        if cache is not None:
+            CACHE_DIR.mkdir(exist_ok=True)
+            shutil.copyfile(test_pdf, cache)
         
         print(f"✅ Test PDF created: {test_pdf}")
         print("🎉 ConvertAPI is working correctly!")
@@ -3,12 +3,9 @@ test_entity_processing.py
 ------------------------
 Unit tests for entity_processing module.
 
-Note: Uses sys.path.insert to import entity_processing from ../kanka_to_md for testability without package install.
+kanka_to_md is put on sys.path by conftest.py, so entity_processing imports without a package install.
 """
 
-import sys
-import os
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../kanka_to_md')))
 import entity_processing  # type: ignore
 
 def test_build_entity_map():
@@ -54,4 +51,17 @@ def test_build_character_id_to_entity_id():
     ]
     mapping = entity_processing.build_character_id_to_entity_id(entries)
     assert mapping[10] == 100
-    assert 20 not in mapping 
\ No newline at end of file
+    assert 20 not in mapping 
+
+def test_build_indexes_matches_separate_passes():
+    entries = [
+        {"id": 10, "name": "Alice", "entity": {"id": 100, "type_id": 1, "type": "character"}},
+        {"id": 20, "name": "Keep", "entity": {"id": 200, "type_id": 3, "type": "location"}},
+        {"id": 11, "name": "Bob", "entity": {"id": 101, "type_id": 1, "type": "character"}},
+        {"id": 30},
+    ]
+    entity_map, by_type_id, char_map = entity_processing.build_indexes(entries, {1})
+    assert entity_map == entity_processing.build_entity_map(entries)
+    assert by_type_id[1] == entity_processing.filter_entities_by_type(entries, {1})
+    assert by_type_id[3] == entity_processing.filter_entities_by_type(entries, {3})
+    assert char_map == entity_processing.build_character_id_to_entity_id(entries)
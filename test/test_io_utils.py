@@ -3,13 +3,14 @@ test_io_utils.py
 ---------------
 Unit tests for io_utils module.
 
-Note: Uses sys.path.insert to import io_utils from ../kanka_to_md for testability without package install.
+kanka_to_md is put on sys.path by conftest.py, so io_utils imports without a package install.
 """
 
-import sys
-import os
 import json
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../kanka_to_md')))
+import math
+
+import pytest
+
 import io_utils  # type: ignore
 
 def test_load_json_entries(tmp_path):
@@ -38,4 +39,32 @@ def test_load_config(tmp_path):
     assert config["include_private"] is True
     # Test default config if file missing
     config = io_utils.load_config(str(tmp_path / "missing.json"))
-    assert config["include_private"] is False 
\ No newline at end of file
+    assert config["include_private"] is False 
+
+def test_load_json_entries_skips_invalid_files(tmp_path):
+    (tmp_path / "good.json").write_text(json.dumps([{"a": 1}, {"b": 2}]))
+    (tmp_path / "bad.json").write_text("{not json")
+    (tmp_path / "notes.txt").write_text("ignored")
+    entries = io_utils.load_json_entries(str(tmp_path))
+    assert entries == [{"a": 1}, {"b": 2}]
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_load_json_entries_same_with_and_without_orjson(tmp_path, monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(io_utils, "orjson", None)
+    elif io_utils.orjson is None:
+        pytest.skip("orjson is not installed")
+    (tmp_path / "bom.json").write_bytes(b'\xef\xbb\xbf[{"bom": 1}]')
+    (tmp_path / "special.json").write_text('[{"nan": NaN, "inf": Infinity, "huge": 1e999}]')
+    (tmp_path / "big.json").write_text('[{"big": 123456789012345678901234567890, "neg": -9223372036854775809}]')
+    (tmp_path / "latin1.json").write_bytes(b'[{"name": "\xe9"}]')
+    entries = io_utils.load_json_entries(str(tmp_path))
+    # The BOM and invalid UTF-8 files are skipped, as json.load rejects them
+    assert sorted(sorted(e) for e in entries) == [["big", "neg"], ["huge", "inf", "nan"]]
+    by_key = {k: v for e in entries for k, v in e.items()}
+    assert math.isnan(by_key["nan"])
+    assert by_key["inf"] == by_key["huge"] == float("inf")
+    assert by_key["big"] == 123456789012345678901234567890
+    assert by_key["neg"] == -9223372036854775809
+    assert isinstance(by_key["big"], int) and isinstance(by_key["neg"], int)
@@ -3,12 +3,9 @@ test_markdown_utils.py
 ---------------------
 Unit tests for markdown_utils module.
 
-Note: Uses sys.path.insert to import markdown_utils from ../kanka_to_md for testability without package install.
+kanka_to_md is put on sys.path by conftest.py, so markdown_utils imports without a package install.
 """
 
-import sys
-import os
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../kanka_to_md')))
 import markdown_utils  # type: ignore
 
 def test_create_anchor_label():
@@ -30,4 +27,17 @@ def test_replace_mentions():
     # Test fallback for missing entity
     text2 = "[character:999]"
     replaced2 = markdown_utils.replace_mentions(text2, entity_map)
-    assert "**Entity_999**" in replaced2 
\ No newline at end of file
+    assert "**Entity_999**" in replaced2 
+
+def test_make_mention_replacer_reuses_links():
+    entity_map = {123: {"name": "Alice"}}
+    replace = markdown_utils.make_mention_replacer(entity_map)
+    assert replace("[character:123] and [note:123]") == "[Alice](#alice) and [Alice](#alice)"
+    assert replace("[character:999]") == "**Entity_999**"
+
+def test_convert_mentions_in_html():
+    html = '<p>Meet <a class="mention" data-mention="[character:1]">Bob</a></p><ul><li><strong>one</strong></li></ul>'
+    result = markdown_utils.convert_mentions_in_html(html)
+    assert "Meet [character:1]" in result
+    assert "- **one**" in result
+    assert "<p>" not in result
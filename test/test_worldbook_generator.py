@@ -0,0 +1,196 @@
+"""
+test_worldbook_generator.py
+--------------------------
+Unit tests for worldbook_generator module.
+
+The repository root is put on sys.path by conftest.py; worldbook_generator is imported
+through the kanka_to_md package because it uses relative imports.
+"""
+
+import os
+
+import pytest
+
+from kanka_to_md import worldbook_generator  # type: ignore
+
+def test_is_private_obj():
+    assert worldbook_generator.is_private_obj({"is_private": 1})
+    assert worldbook_generator.is_private_obj({"entity": {"is_private": 1}})
+    assert not worldbook_generator.is_private_obj({"is_private": 0, "entity": {}})
+    assert not worldbook_generator.is_private_obj({})
+
+
+def test_get_entity_image_path(tmp_path, monkeypatch):
+    names = ['abc-thumb.png', 'abc.png', 'abc.json', 'def-thumb.jpg', 'campaign.webp']
+    for name in names:
+        (tmp_path / name).write_text('')
+    # Pin the listing order so the suffixed file is seen before the exact one
+    monkeypatch.setattr(worldbook_generator.os, 'listdir', lambda path: list(names))
+    gallery = worldbook_generator.GalleryIndex(str(tmp_path))
+    get_path = worldbook_generator.get_entity_image_path
+    # An exact '<uuid>.<ext>' file wins over '<uuid>-suffix' files
+    assert get_path({'image_uuid': 'abc'}, gallery) == 'gallery/abc.png'
+    assert get_path({'entity': {'image_uuid': 'abc'}}, gallery) == 'gallery/abc.png'
+    # Without one, a suffixed file is still found
+    assert get_path({'image_uuid': 'def'}, gallery) == 'gallery/def-thumb.jpg'
+    assert get_path({'image_uuid': 'missing'}, gallery) is None
+    assert get_path({'entity': {}}, gallery) is None
+    # Campaigns name the file in 'image', matched exactly or by stem
+    assert get_path({'id': 1, 'image': 'w/campaign.webp'}, gallery) == 'gallery/campaign.webp'
+    assert get_path({'id': 1, 'image': 'w/campaign.png'}, gallery) == 'gallery/campaign.webp'
+    # The gallery directory can be passed instead of an index
+    assert get_path({'image_uuid': 'abc'}, str(tmp_path)) == 'gallery/abc.png'
+
+
+def test_generate_worldbook_into_matches_generate_worldbook():
+    import io
+    entities = {
+        "campaign": {"name": "Realm", "entry": "<p>Hello</p>"},
+        "organizations": [{"id": 1, "name": "Guild", "entity": {"id": 10, "entry": "Guild entry"}}],
+    }
+    buf = io.StringIO()
+    worldbook_generator.generate_worldbook_into(buf, entities)
+    assert buf.getvalue() == worldbook_generator.generate_worldbook(entities)
+    assert buf.getvalue().startswith("# Realm ((+campaign-overview))")
+    # With an `out` stream, generate_worldbook writes there instead of returning
+    out = io.StringIO()
+    assert worldbook_generator.generate_worldbook(entities, out=out) is None
+    assert out.getvalue() == buf.getvalue()
+
+
+GOLDEN_DIR = os.path.join(os.path.dirname(__file__), 'golden')
+GALLERY_FILES = ('loc-uuid.png', 'loc-uuid.json', 'campaign.png', 'campaign.json')
+
+
+def build_worldbook_fixture():
+    """A small campaign covering every chapter writer, the privacy flags and posts."""
+    def entity(eid, etype, name, **extra):
+        return {"id": eid, "type": etype, "name": name, **extra}
+
+    def post(name, entry, visibility_id=1, position=0, created_at="2024-01-01"):
+        return {"name": name, "entry": entry, "visibility_id": visibility_id,
+                "position": position, "created_at": created_at}
+
+    # Nested locations: a private one, a nameless one, one whose parent is
+    # missing, one with a gallery image and one made private on its entity
+    locations = {}
+    for loc_id, name, parent, extra in [
+        (1, "Northreach", None, {"entry": "<p>Cold <strong>lands</strong> near [location:103]</p>"}),
+        (2, "Southmarch", None, {"entry": "<p>Warm plains</p>"}),
+        (3, "Frost_Gate", 1, {"entry": "<p>The gate of [character:201]</p>"}),
+        (4, "Hidden Vale", 1, {"is_private": 1, "entry": "<p>Secret</p>"}),
+        (5, "", 2, {"entry": "<p>Unnamed hamlet</p>"}),
+        (6, "Ice Cave", 3, {"image_uuid": "loc-uuid"}),
+        (7, "Lost Tower", 99, {}),
+        (8, "Ember Keep", 2, {"entity_private": True}),
+    ]:
+        eid = 100 + loc_id
+        ent = entity(eid, "location", f"Loc {loc_id}",
+                     is_private=1 if extra.pop("entity_private", False) else 0)
+        if "image_uuid" in extra:
+            ent["image_uuid"] = extra.pop("image_uuid")
+        locations[eid] = {"id": loc_id, "name": name, "location_id": parent, "entity": ent, **extra}
+
+    characters = [
+        {"id": 1, "name": "Aldric_Vane", "location_id": 3, "age": 42, "gender": "Male",
+         "entry": '<p>Knight of <a class="mention" data-mention="[location:101]">North</a></p>',
+         "character_races": [{"race": {"id": 1, "name": "Human"}}],
+         "character_families": [{"family": {"id": 1, "name": "House Vane"}}],
+         "entity": entity(201, "character", "Aldric", posts=[
+             post("Early life", "<p>Born in [location:102]</p>", position=1),
+             post("Oath", "<p>Sworn</p>", position=0),
+             post("GM notes", "<p>Hidden</p>", visibility_id=2),
+             post("Blank", "<br>"),
+         ])},
+        {"id": 2, "name": "Brina", "location_id": 6, "is_dead": True, "sex": "Female",
+         "characterRaces": [{"race": {"id": 2, "name": "High Elf"}}],
+         "characterFamilies": [{"family": {"name": "Nameless Kin"}}],
+         "entity": entity(202, "character", "Brina", is_dead=True)},
+        {"id": 3, "name": "Cato", "location_id": 4, "is_private": 1,
+         "entry": "<p>Spy</p>", "entity": entity(203, "character", "Cato")},
+        {"id": 4, "name": None, "location_id": None, "entry": "<p>Wanderer</p>",
+         "entity": entity(204, "character", "Drifter")},
+        {"id": 5, "name": "Eda", "location_id": 99,
+         "entity": entity(205, "character", "Eda", is_private=1)},
+    ]
+
+    organizations = [
+        {"id": 1, "name": "Silver Order", "entity": entity(301, "organisation", "Silver Order",
+                                                           entry="<p>Led by [character:201]</p>"),
+         "members": [{"character_id": 1, "role": "Grand_Master"}, {"character_id": 2},
+                     {"character_id": 999}]},
+        {"id": 2, "name": "Shadow Hand", "is_private": 1,
+         "entity": entity(302, "organisation", "Shadow Hand"), "members": [{"character_id": 3}]},
+    ]
+
+    races = [
+        {"id": 1, "name": "Human", "entry": "<p>Common folk</p>", "entity": entity(401, "race", "Human")},
+        {"id": 2, "name": "High Elf", "race_id": 3, "entity": entity(402, "race", "High Elf")},
+        {"id": 3, "name": "Elf", "entry": "<p>Old_blood</p>", "entity": entity(403, "race", "Elf")},
+        {"id": 4, "name": "Shade", "race_id": 3, "is_private": 1, "entity": entity(404, "race", "Shade")},
+    ]
+
+    def hierarchical(etype, parent_field, base):
+        return [
+            {"id": 1, "name": f"First {etype}", "entry": f"<p>About [{etype}:{base + 2}]</p>",
+             "age": 7, "gender": "None", "location_id": 1,
+             "entity": entity(base + 1, etype, f"First {etype}",
+                              tags=[{"name": "Lore"}, "plain", 5],
+                              posts=[post(f"{etype} post", "<p>Post_body</p>"),
+                                     post("Hidden post", "<p>x</p>", visibility_id=3)])},
+            {"id": 2, "name": f"Child {etype}", parent_field: 1, "entry": "",
+             "entity": entity(base + 2, etype, f"Child {etype}", entry="<p>Entity fallback</p>")},
+            {"id": 3, "name": None, parent_field: 2, "is_private": 1,
+             "entity": entity(base + 3, etype, f"Unnamed {etype}")},
+        ]
+
+    entities = {
+        "campaign": {"id": 1, "name": "Realm_of_Ash", "entry": "<p>Welcome to [location:101]</p>",
+                     "excerpt": "An excerpt", "image": "campaigns/campaign.png"},
+        "locations": locations,
+        "characters": characters,
+        "organizations": organizations,
+        "races": races,
+        "events": hierarchical("event", "event_id", 500),
+        "notes": hierarchical("note", "note_id", 510),
+        "items": hierarchical("item", "item_id", 520),
+        "families": hierarchical("family", "family_id", 530),
+        "journals": hierarchical("journal", "journal_id", 540),
+        "quests": hierarchical("quest", "quest_id", 550),
+        "maps": [], "timelines": [], "calendars": [], "tags": [],
+    }
+    entities["families"][0]["pivotMembers"] = [{"character_id": 1}, {"character_id": 2},
+                                               {"character_id": 999}]
+
+    entity_map = {}
+    for value in entities.values():
+        for item in (value.values() if isinstance(value, dict) else value):
+            if isinstance(item, dict) and "entity" in item:
+                ent = item["entity"]
+                entity_map[ent["id"]] = {"name": item.get("name") or ent["name"], "type": ent["type"]}
+    entities["entity_map"] = entity_map
+    entities["character_id_to_entity_id"] = {c["id"]: c["entity"]["id"] for c in characters}
+    return entities
+
+
+def golden_name(include_private, include_posts, language):
+    visibility = 'private' if include_private else 'public'
+    posts = 'posts' if include_posts else 'noposts'
+    return f"worldbook_{visibility}_{posts}_{language}.md"
+
+
+@pytest.mark.parametrize("language", ["en", "hu"])
+@pytest.mark.parametrize("include_posts", [True, False])
+@pytest.mark.parametrize("include_private", [False, True])
+def test_generate_worldbook_matches_golden(include_private, include_posts, language, tmp_path, monkeypatch):
+    gallery = tmp_path / "gallery"
+    gallery.mkdir()
+    for name in GALLERY_FILES:
+        (gallery / name).write_bytes(b"")
+    monkeypatch.setattr(worldbook_generator, "GALLERY_DIR", str(gallery))
+    markdown = worldbook_generator.generate_worldbook(
+        build_worldbook_fixture(), include_private=include_private,
+        include_posts=include_posts, language=language)
+    with open(os.path.join(GOLDEN_DIR, golden_name(include_private, include_posts, language)),
+              encoding="utf-8", newline="") as f:
+        assert markdown == f.read()